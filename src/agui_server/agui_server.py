@@ -23,7 +23,7 @@ from agent_framework.azure import AzureOpenAIChatClient
 # Add the parent directory (src) to the path to enable sibling imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from workflows.planning_workflow import workflow
+from workflows.planning_workflow import get_workflow
 
 load_dotenv()
 
@@ -108,7 +108,7 @@ async def index():
 # Convert workflow to agent using as_agent() method
 try:
     logger.info("Converting workflow to agent...")
-    workflow_agent = workflow.as_agent()
+    workflow_agent = get_workflow().as_agent()
     logger.info(f"Workflow agent created: {workflow_agent}")
     logger.info("Registering /workflow endpoint with AG UI...")
     add_agent_framework_fastapi_endpoint(
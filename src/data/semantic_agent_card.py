@@ -1,12 +1,11 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Literal
 
 @dataclass
 class AgentRepositoryCard:
     """Represents a query example with metadata."""
     agent_id: str
-    is_foundry_agent: bool
-    is_a2a_agent: bool
+    kind: Literal["foundry", "a2a"]
     url: str
     name: str
     description: str
@@ -1,40 +1,120 @@
 import os
+import re
+import unicodedata
 from typing import Optional
+import asyncio
 import logging
 import math
+import time
+from collections import OrderedDict
+from functools import partial
 import httpx
+import numpy as np
 from dotenv import load_dotenv
 
+try:
+    import faiss
+except ImportError:  # pragma: no cover - optional dependency
+    faiss = None
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - optional dependency
+    njit = None
+
 from a2a.types import (
     AgentCapabilities,
     AgentCard,
 )
 from a2a.client import A2ACardResolver
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from agent_framework.a2a import A2AAgent
-from azure.ai.projects import AIProjectClient
 from src.data.agent_query_example import AgentQueryExample
 from src.data.semantic_agent_card import AgentRepositoryCard
 from src.intranet_agent.intranet_agent_card import intranet_agent_card as get_intranet_agent_card
 from src.data.query_execution_result import QueryExecutionResult
 from src.work_env_agent.work_env_agent_card import work_env_agent_card as get_work_env_agent_card
 from src.hello_world_agent.hello_world_agent_card import hello_world_agent_card as get_hello_world_agent_card
-from src.workflows.model_client import create_chat_client
+from src.workflows.model_client import AZURE_OPENAI_EMBEDDING_MODEL, create_chat_client, create_embedding_client, get_embedding_batcher, get_project_client
 
 load_dotenv()
 
 AZURE_OPENAI_SMALL_CHAT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_SMALL_CHAT_DEPLOYMENT_NAME", "")
 AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME", "")
+AGENT_CARD_CACHE_TTL_SECONDS = float(os.getenv("AGENT_CARD_CACHE_TTL_SECONDS", "300"))
+# Above this many cards the FAISS index switches from exhaustive to HNSW search
+AGENT_INDEX_HNSW_THRESHOLD = int(os.getenv("AGENT_INDEX_HNSW_THRESHOLD", "10000"))
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "256"))
+RECOMMENDATION_CACHE_THRESHOLD = float(os.getenv("RECOMMENDATION_CACHE_THRESHOLD", "0.86"))
+# Exact-query recommendation cache, checked before any embedding is computed
+RECOMMENDATION_EXACT_CACHE_SIZE = int(os.getenv("RECOMMENDATION_EXACT_CACHE_SIZE", "10000"))
+RECOMMENDATION_EXACT_CACHE_TTL_SECONDS = float(os.getenv("RECOMMENDATION_EXACT_CACHE_TTL_SECONDS", "600"))
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for exact-match cache keys: NFKC, lowercase, single spaces, no trailing punctuation."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query).lower()).rstrip(" .,?!").strip()
+
+
+def _cosine_numpy(a: np.ndarray, b: np.ndarray) -> float:
+    """Cosine similarity of two float32 vectors."""
+    return float(a @ b) / math.sqrt(float(a @ a) * float(b @ b))
+
+
+def _cosine_loop(a, b):
+    """Single-pass cosine similarity, compiled by Numba when it is installed."""
+    dot = 0.0
+    na = 0.0
+    nb = 0.0
+    for i in range(a.shape[0]):
+        x = a[i]
+        y = b[i]
+        dot += x * y
+        na += x * x
+        nb += y * y
+    return dot / math.sqrt(na * nb)
+
+
+_cosine = njit(cache=True, fastmath=True)(_cosine_loop) if njit is not None else _cosine_numpy
+
+
 class AgentRegistryTool():
     """Tool that searches for similar queries using Azure AI Search."""
 
     def __init__(self) -> None:
         self.AGENT_CARDS = {}
+        # Executors per AgentRepositoryCard.kind
+        self._handlers = {
+            "foundry": self._execute_foundry_agent,
+            "a2a": self._execute_a2a_agent,
+        }
+        # Resolved A2A agent cards keyed by agent host: (resolved_at, card)
+        self._card_cache: dict[str, tuple[float, AgentCard]] = {}
+        # OpenAI client of the Azure AI project, created on the first Foundry agent call
+        self._project_openai_client = None
+        # Registered agent ids and the static recommender instructions, rebuilt whenever a card is added
+        self._available_ids: tuple[str, ...] = ()
+        self._recommender_instructions: tuple[str, ...] = ()
+        # Card embeddings for cosine ranking, built lazily on first use
+        self._embedding_client = None
+        self._embedding_ids: list[str] = []
+        # L2-normalized embeddings stored as int8 with a float32 scale per row
+        self._embedding_matrix: Optional[np.ndarray] = None
+        self._embedding_scales: Optional[np.ndarray] = None
+        # Used instead of the NumPy matrix when faiss is installed
+        self._faiss_index = None
+        # Semantic recommendation cache: unit query embeddings, results and last-use times
+        self._recommendation_embeddings: Optional[np.ndarray] = None
+        self._recommendation_values: list[AgentQueryExample] = []
+        self._recommendation_last_used: list[float] = []
+        # Recommendation runs in flight, keyed by normalized query
+        self._inflight_recommendations: dict[str, asyncio.Task] = {}
+        # Recommendations by normalized query text: query -> (stored_at, recommendation)
+        self._exact_recommendations: OrderedDict[str, tuple[float, AgentQueryExample]] = OrderedDict()
 
         default_domain = os.environ.get("DEFAULT_DOMAIN", "").strip()
         if default_domain:
@@ -50,25 +130,107 @@ class AgentRegistryTool():
 
     def get_all_agents(self) -> str:
         """Get all registered agent cards."""
-        agent_descriptions = ""
-
-        for agent_id, agent_card in self.AGENT_CARDS.items():
-            agent_descriptions += f"Agent ID: {agent_id}, Name: {agent_card.name}, Description: {agent_card.description}, Skills: {agent_card.skills}, Examples: {agent_card.examples}\n"
-        return agent_descriptions
+        return self._format_agents(self.AGENT_CARDS.keys())
+
+    async def shortlist_agents(self, query: str, k: int = 10) -> str:
+        """Get the registered agent cards most similar to the query, best match first."""
+        q = await self._aembed_text(query)
+        # The first call embeds every card, so keep it off the event loop
+        ranked = await asyncio.to_thread(self.rank_by_cosine, q, k)
+        return self._format_agents(agent_id for agent_id, _ in ranked)
+
+    def _format_agents(self, agent_ids) -> str:
+        # The skill text already lists each skill's examples, so the examples field is not repeated
+        return "".join(
+            f"Agent ID: {agent_id}, Name: {self.AGENT_CARDS[agent_id].name}, Description: {self.AGENT_CARDS[agent_id].description}, Skills: {self.AGENT_CARDS[agent_id].skills}\n"
+            for agent_id in agent_ids
+        )
     
+    @staticmethod
+    def _format_skills(agent_card: AgentCard) -> tuple[str, str]:
+        """Render the skill and example text of an agent card in a single pass."""
+        skill_lines = []
+        example_lines = []
+        for skill in agent_card.skills:
+            skill_lines.append(f"{skill.name}: {skill.description}, examples: {skill.examples}  \n")
+            example_lines.extend(f"{example}  \n" for example in skill.examples)
+        return "".join(skill_lines), "".join(example_lines)
+
+    def _rebuild_prompt(self) -> None:
+        """Refresh the agent ids and the card-dependent part of the recommender instructions."""
+        self._available_ids = tuple(self.AGENT_CARDS.keys())
+        agents_list = ", ".join(
+            f"{card.agent_id}: {card.name}, description: {card.description}, skills: {card.skills}, examples: {card.examples}"
+            for card in self.AGENT_CARDS.values()
+        )
+        self._recommender_instructions = (
+            "You are a recommender agent that selects which of the available agents is best suited to answer the user's query. ",
+            "IMPORTANT: You MUST ONLY select an agent from the provided list below. Do NOT invent, create, or reference any agents that are not explicitly listed. ",
+            f"The ONLY valid agent_id values you can use are: {list(self._available_ids)}. Any other agent_id is invalid. ",
+            "You should create a prompt for the selected agent that will help it answer the user's query effectively. ",
+            f"This is the COMPLETE list of available agents: {agents_list}. ",
+            "Based on the user's query, recommend the most appropriate agent from this list by providing its exact agent_id (must match one from the list), a suitable query for that agent, a brief description of why this agent is appropriate, the intent, the category, and the complexity level (low, medium, high) of the query. ",
+            "If none of the available agents can handle the query, select the closest match and explain the limitations. ",
+        )
+
+    def _on_cards_changed(self) -> None:
+        """Drop everything derived from the registered cards."""
+        self._rebuild_prompt()
+        self._embedding_matrix = None
+        self._faiss_index = None
+        self._recommendation_embeddings = None
+        self._recommendation_values = []
+        self._recommendation_last_used = []
+        self._exact_recommendations.clear()
+
+    def _lookup_recommendation(self, q_unit: np.ndarray, query: str) -> Optional[AgentQueryExample]:
+        """Return the agent recommended for a semantically similar query, if any.
+
+        Only the agent_id is reused; the rewritten query, intent and category belong to the
+        earlier question, so the current question is passed through to the agent instead.
+        """
+        if self._recommendation_embeddings is None:
+            return None
+        sims = self._recommendation_embeddings @ q_unit
+        best = int(sims.argmax())
+        if sims[best] < RECOMMENDATION_CACHE_THRESHOLD:
+            return None
+        self._recommendation_last_used[best] = time.monotonic()
+        agent_id = self._recommendation_values[best].agent_id
+        return AgentQueryExample(
+            agent_id=agent_id,
+            query=query,
+            description=self.AGENT_CARDS[agent_id].description,
+            intent="",
+            score=float(sims[best]),
+        )
+
+    def _store_recommendation(self, q_unit: np.ndarray, recommendation: AgentQueryExample) -> None:
+        """Cache a recommendation, evicting the least recently used entry when full."""
+        if self._recommendation_embeddings is None:
+            self._recommendation_embeddings = q_unit[None, :]
+            self._recommendation_values = [recommendation]
+            self._recommendation_last_used = [time.monotonic()]
+            return
+
+        if len(self._recommendation_values) >= RECOMMENDATION_CACHE_SIZE:
+            oldest = self._recommendation_last_used.index(min(self._recommendation_last_used))
+            self._recommendation_embeddings[oldest] = q_unit
+            self._recommendation_values[oldest] = recommendation
+            self._recommendation_last_used[oldest] = time.monotonic()
+            return
+
+        self._recommendation_embeddings = np.vstack([self._recommendation_embeddings, q_unit])
+        self._recommendation_values.append(recommendation)
+        self._recommendation_last_used.append(time.monotonic())
+
     def add_foundry_agent_card(self, agent_id: str, agent_card: AgentCard) -> None:
         """Add a Foundry agent card to the tool's collection."""
-        skill_text = ""
-        example_text = ""
-        for skill in agent_card.skills:
-            skill_text += f"{skill.name}: {skill.description}, examples: {skill.examples}  \n"
-            for example in skill.examples:
-                example_text += f"{example}  \n"
+        skill_text, example_text = self._format_skills(agent_card)
 
         new_agent_card = AgentRepositoryCard(
             agent_id=agent_id,
-            is_foundry_agent=True,
-            is_a2a_agent=False,
+            kind="foundry",
             name=agent_card.name,
             url=agent_card.url,
             description=agent_card.description,
@@ -77,55 +239,68 @@ class AgentRegistryTool():
         )
 
         self.AGENT_CARDS[agent_id] = new_agent_card
+        self._on_cards_changed()
 
     def add_a2a_agent_card(self, agent_id: str, agent_card: AgentCard) -> None:
         """Add an agent card to the tool's collection."""
+        skill_text, example_text = self._format_skills(agent_card)
 
-        # description_vector = get_openai_client().embeddings.create(
-        #     input=agent_card.description, model=EMBEDDING_DEPLOYMENT, dimensions=EMBEDDING_DIMENSIONS
-        # ).data[0].embedding
-
-        skill_text = ""
-        example_text = ""
-        for skill in agent_card.skills:
-            skill_text += f"{skill.name}: {skill.description}, examples: {skill.examples}  \n"
-            for example in skill.examples:
-                example_text += f"{example}  \n"
-        # skills_vector = get_openai_client().embeddings.create(
-        #     input=skill_text, model=EMBEDDING_DEPLOYMENT, dimensions=EMBEDDING_DIMENSIONS
-        # ).data[0].embedding
-
-
-        
-        # examples_vector = get_openai_client().embeddings.create(
-        #     input=example_text, model=EMBEDDING_DEPLOYMENT, dimensions=EMBEDDING_DIMENSIONS
-        # ).data[0].embedding
-
-        new_agent_card = AgentRepositoryCard(agent_id=agent_id, is_foundry_agent=False, is_a2a_agent=True, name=agent_card.name, url=agent_card.url, description=agent_card.description, skills=skill_text, examples=example_text)
+        new_agent_card = AgentRepositoryCard(agent_id=agent_id, kind="a2a", name=agent_card.name, url=agent_card.url, description=agent_card.description, skills=skill_text, examples=example_text)
 
         self.AGENT_CARDS[agent_id] = new_agent_card
+        self._on_cards_changed()
 
     async def generate_agent_recommendation(self, query: str) -> AgentQueryExample:
-        """Execute the search and return a list of AgentQueryExample objects."""
+        """Execute the search and return a list of AgentQueryExample objects.
+
+        Concurrent calls for the same query share a single recommendation run.
+        """
+        key = normalize_query(query)
+        entry = self._exact_recommendations.get(key)
+        if entry is not None:
+            stored_at, recommendation = entry
+            if time.monotonic() - stored_at <= RECOMMENDATION_EXACT_CACHE_TTL_SECONDS:
+                self._exact_recommendations.move_to_end(key)
+                return recommendation.model_copy(deep=True)
+            del self._exact_recommendations[key]
+
+        task = self._inflight_recommendations.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_agent_recommendation(query))
+            self._inflight_recommendations[key] = task
+            task.add_done_callback(partial(self._on_recommendation_done, key))
+        # Shielded so a cancelled caller does not cancel the run the other callers wait on
+        recommendation = await asyncio.shield(task)
+        return recommendation.model_copy(deep=True)
+
+    def _on_recommendation_done(self, key: str, task: asyncio.Task) -> None:
+        """Drop the finished run and keep its result in the exact-query cache."""
+        self._inflight_recommendations.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._exact_recommendations[key] = (time.monotonic(), task.result().model_copy(deep=True))
+        self._exact_recommendations.move_to_end(key)
+        if len(self._exact_recommendations) > RECOMMENDATION_EXACT_CACHE_SIZE:
+            self._exact_recommendations.popitem(last=False)
+
+    async def _generate_agent_recommendation(self, query: str) -> AgentQueryExample:
         try:
+            q_unit = None
+            try:
+                q = await self._aembed_text(query)
+                q_unit = q / np.linalg.norm(q)
+                cached = self._lookup_recommendation(q_unit, query)
+                if cached is not None:
+                    logger.info("Recommendation cache hit for query: %s", query)
+                    return cached
+            except Exception as exc:
+                logger.warning("Recommendation cache unavailable: %s", exc)
 
             chat_client = create_chat_client(model_name=AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME, agent_name="Recommender")
 
-            available_agent_ids = list(self.AGENT_CARDS.keys())
-            agents_list = ", ".join([f"{card.agent_id}: {card.name}, description: {card.description}, skills: {card.skills}, examples: {card.examples}" for card in self.AGENT_CARDS.values()])
-            
             recommender = chat_client.create_agent(
                 name="Recommender",
-                instructions=(
-                    "You are a recommender agent that selects which of the available agents is best suited to answer the user's query. ",
-                    "IMPORTANT: You MUST ONLY select an agent from the provided list below. Do NOT invent, create, or reference any agents that are not explicitly listed. ",
-                    f"The ONLY valid agent_id values you can use are: {available_agent_ids}. Any other agent_id is invalid. ",
-                    "You should create a prompt for the selected agent that will help it answer the user's query effectively. ",
-                    f"This is the COMPLETE list of available agents: {agents_list}. ",
-                    "Based on the user's query, recommend the most appropriate agent from this list by providing its exact agent_id (must match one from the list), a suitable query for that agent, a brief description of why this agent is appropriate, the intent, the category, and the complexity level (low, medium, high) of the query. ",
-                    "If none of the available agents can handle the query, select the closest match and explain the limitations. ",
-                    "This is the user input: " + query + ". "
-                ),
+                instructions=self._recommender_instructions + ("This is the user input: " + query + ". ",),
                 tools=[],
             )
 
@@ -137,6 +312,8 @@ class AgentRegistryTool():
             if response.value:
                 agent_query_info = response.value
                 print(f"Agent ID: {agent_query_info.agent_id}, Query: {agent_query_info.query}, Description: {agent_query_info.description}, Intent: {agent_query_info.intent}, Category: {agent_query_info.category}, Complexity: {agent_query_info.complexity}, Score: {agent_query_info.score}")
+                if q_unit is not None:
+                    self._store_recommendation(q_unit, agent_query_info.model_copy(deep=True))
             else:
                 print("No structured data found in response")
             
@@ -155,89 +332,190 @@ class AgentRegistryTool():
             print("Vector2 has length: ", len(vector2))
             raise ValueError("Vectors must be the same length")
 
-        dot_product = sum(x * y for x, y in zip(vector1, vector2))
-        magnitude1 = math.sqrt(sum(x * x for x in vector1))
-        magnitude2 = math.sqrt(sum(x * x for x in vector2))
-        cos_similarity = round(dot_product / (magnitude1 * magnitude2), 10)
+        cos_similarity = round(
+            _cosine(np.asarray(vector1, dtype=np.float32), np.asarray(vector2, dtype=np.float32)), 10
+        )
         return cos_similarity
 
+    def _get_embedding_client(self):
+        if self._embedding_client is None:
+            self._embedding_client = create_embedding_client()
+        return self._embedding_client
+
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed several texts with one request, returning one row per input."""
+        response = self._get_embedding_client().embeddings.create(
+            input=texts, model=AZURE_OPENAI_EMBEDDING_MODEL
+        )
+        matrix = np.empty((len(texts), len(response.data[0].embedding)), dtype=np.float32)
+        for item in response.data:
+            matrix[item.index] = item.embedding
+        return matrix
+
+    def _embed_text(self, text: str) -> np.ndarray:
+        """Embed a single text with the shared embedding client."""
+        return self._embed_texts([text])[0]
+
+    async def _aembed_text(self, text: str) -> np.ndarray:
+        """Embed a single text on the event loop, batched with concurrent embedding requests."""
+        return np.asarray(await get_embedding_batcher().embed(text), dtype=np.float32)
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Symmetrically quantize L2-normalized rows to int8 with a per-row scale."""
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _build_embedding_index(self) -> None:
+        """Embed every registered card and cache the quantized unit-length matrix."""
+        self._embedding_ids = list(self.AGENT_CARDS.keys())
+        matrix = self._embed_texts([
+            f"{card.description}\n{card.skills}\n{card.examples}"
+            for card in self.AGENT_CARDS.values()
+        ])
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        if faiss is not None:
+            dim = matrix.shape[1]
+            if matrix.shape[0] > AGENT_INDEX_HNSW_THRESHOLD:
+                index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+                index.train(matrix)
+            index.add(matrix)
+            self._faiss_index = index
+            return
+
+        self._embedding_matrix, self._embedding_scales = self._quantize(matrix)
+
+    def rank_by_cosine(self, query_vector, k: int = 5) -> list[tuple[str, float]]:
+        """Rank registered agents by cosine similarity to an embedded query.
+
+        Returns up to ``k`` (agent_id, similarity) pairs, best match first.
+        """
+        if self._embedding_matrix is None and self._faiss_index is None:
+            self._build_embedding_index()
+
+        q = np.asarray(query_vector, dtype=np.float32)
+        dim = self._faiss_index.d if self._faiss_index is not None else self._embedding_matrix.shape[1]
+        if q.shape[0] != dim:
+            raise ValueError("Vectors must be the same length")
+        q_unit = q / np.linalg.norm(q)
+
+        if self._faiss_index is not None:
+            scores, indices = self._faiss_index.search(q_unit[None, :], min(k, self._faiss_index.ntotal))
+            return [(self._embedding_ids[i], float(score)) for score, i in zip(scores[0], indices[0]) if i >= 0]
+
+        q_quantized, q_scale = self._quantize(q_unit[None, :])
+        raw = self._embedding_matrix.astype(np.int32) @ q_quantized[0].astype(np.int32)
+        sims = raw.astype(np.float32) * self._embedding_scales * q_scale[0]
+        k = min(k, sims.shape[0])
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self._embedding_ids[i], float(sims[i])) for i in top]
+
+    async def _resolve_agent_card(self, http_client: httpx.AsyncClient, a2a_agent_host: str) -> AgentCard:
+        """Return the agent card for a host, resolving it only when the cached copy expired."""
+        cached = self._card_cache.get(a2a_agent_host)
+        if cached and time.monotonic() - cached[0] < AGENT_CARD_CACHE_TTL_SECONDS:
+            return cached[1]
+
+        resolver = A2ACardResolver(httpx_client=http_client, base_url=a2a_agent_host)
+        agent_card = await resolver.get_agent_card()
+        self._card_cache[a2a_agent_host] = (time.monotonic(), agent_card)
+        return agent_card
+
+    async def _execute_foundry_agent(self, card: AgentRepositoryCard, query: str) -> QueryExecutionResult:
+        """Execute a Foundry agent through the Azure AI project."""
+        project_endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT", "").strip()
+        if not project_endpoint:
+            raise ValueError("AZURE_AI_PROJECT_ENDPOINT is not set in environment variables.")
+
+        project_client = get_project_client()
+
+        # The project SDK is synchronous; run its network calls off the event loop
+        agent = await asyncio.to_thread(project_client.agents.get, agent_name=card.name)
+        logger.debug("Retrieved agent: %s", agent.name)
+
+        if self._project_openai_client is None:
+            self._project_openai_client = project_client.get_openai_client()
+        openai_client = self._project_openai_client
+
+        # Reference the agent to get a response
+        response = await asyncio.to_thread(
+            openai_client.responses.create,
+            input=[{"role": "user", "content": query}],
+            extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
+        )
+
+        # output_text is already aggregated by the SDK; str(response) would dump the whole model
+        response_text = response.output_text
+        logger.debug("Response output: %s", response_text)
+        return QueryExecutionResult(
+            id=card.agent_id,
+            query=query,
+            content=response_text,
+            score=1.0,
+            is_error=False )
+
+    async def _execute_a2a_agent(self, card: AgentRepositoryCard, query: str) -> QueryExecutionResult:
+        """Execute a remote agent using the A2A protocol."""
+        a2a_agent_host = card.url
+
+        # Initialize A2ACardResolver
+        async with httpx.AsyncClient(timeout=80.0) as http_client:
+            # Get agent card (cached per host)
+            agent_card = await self._resolve_agent_card(http_client, a2a_agent_host)
+            logger.info(f"Found agent: {agent_card.name} - {agent_card.description}")
+
+            # Create A2A agent instance
+            agent = A2AAgent(
+                name=agent_card.name,
+                description=agent_card.description,
+                agent_card=agent_card,
+                url=a2a_agent_host,
+            )
+
+            logger.info(f"Found agent capabilities: {agent_card}")
+
+            # Invoke the agent and get the result
+            logger.info(f"Sending message to {agent_card.name} agent...")
+            try:
+                response = await agent.run(query)
+            except Exception as exc:
+                # The agent moved or timed out; drop the cached card so the next call re-resolves it
+                if getattr(exc, "status_code", None) in (404, 408):
+                    self._card_cache.pop(a2a_agent_host, None)
+                raise
+
+            # Extract the response content
+            response_content = str(response.value) if response.value else str(response)
+
+            return QueryExecutionResult(
+                id=card.agent_id,
+                query=query,
+                content=response_content,
+                score=1.0,
+                is_error=False
+            )
+
     async def execute_agent(self, agent_id: str, query: str) -> QueryExecutionResult:
         """Execute the agent using A2A protocol and return the result."""
         try:
             # Get the agent card from the registry
-            if agent_id not in self.AGENT_CARDS:
+            agent_repository_card = self.AGENT_CARDS.get(agent_id)
+            if agent_repository_card is None:
                 logger.error(f"Agent with id '{agent_id}' not found in registry")
                 return QueryExecutionResult(
                     id=agent_id,
                     query=query,
-                    content=f"Agent '{agent_id}' not found in registry",
+                    content=f"Agent '{agent_id}' not found in registry. Valid agent_id values: {', '.join(self._available_ids)}",
                     is_error=True
                 )
 
-            agent_repository_card = self.AGENT_CARDS[agent_id]
-
-            if (agent_repository_card.is_foundry_agent == True):
-                
-                project_endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT", "").strip()
-                if not project_endpoint:
-                    credential = DefaultAzureCredential()
-                    logger.error("AZURE_AI_PROJECT_ENDPOINT is not set in environment variables.")
-                    project_client = AIProjectClient(endpoint=project_endpoint, credential=credential)
-
-                    agent = project_client.agents.get(agent_name=agent_repository_card.name)
-                    print(f"Retrieved agent: {agent.name}")
-
-                    openai_client = project_client.get_openai_client()
-
-                    # Reference the agent to get a response
-                    response = openai_client.responses.create(
-                        input=[{"role": "user", "content": query}],
-                        extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
-                    )
-
-                    print(f"Response output: {response.output_text}")
-                    return QueryExecutionResult(
-                        id=agent_id,
-                        query=query,
-                        content=str(response),
-                        score=1.0,
-                        is_error=False )
-
-            if (agent_repository_card.is_a2a_agent == True):
-                a2a_agent_host = agent_repository_card.url
-
-                # Initialize A2ACardResolver
-                async with httpx.AsyncClient(timeout=80.0) as http_client:
-                    resolver = A2ACardResolver(httpx_client=http_client, base_url=a2a_agent_host)
-
-                    # Get agent card
-                    agent_card = await resolver.get_agent_card()
-                    logger.info(f"Found agent: {agent_card.name} - {agent_card.description}")
-
-                    # Create A2A agent instance
-                    agent = A2AAgent(
-                        name=agent_card.name,
-                        description=agent_card.description,
-                        agent_card=agent_card,
-                        url=a2a_agent_host,
-                    )
-
-                    logger.info(f"Found agent capabilities: {agent_card}")
-
-                    # Invoke the agent and get the result
-                    logger.info(f"Sending message to {agent_card.name} agent...")
-                    response = await agent.run(query)
-
-                    # Extract the response content
-                    response_content = str(response.value) if response.value else str(response)
-
-                    return QueryExecutionResult(
-                        id=agent_id,
-                        query=query,
-                        content=response_content,
-                        score=1.0,
-                        is_error=False
-                    )
+            return await self._handlers[agent_repository_card.kind](agent_repository_card, query)
 
         except Exception as exc:  # pragma: no cover - defensive
             logger.error(f"Error executing agent '{agent_id}': {exc}")
@@ -246,4 +524,4 @@ class AgentRegistryTool():
                 query=query,
                 content=str(exc),
                 is_error=True
-            )
\ No newline at end of file
+            )
@@ -1,50 +1,76 @@
 import logging
+from collections import defaultdict
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional
 
+# Domain hint mappings based on available agent capabilities, shared read-only by all instances
+DOMAIN_HINTS = MappingProxyType({
+    "OfficeLocations": {
+        "description": "Company office locations and location-specific news",
+        "terms": ["office", "location", "St. Louis", "London", "Berlin", "Leverkusen", "site", "facilities"],
+        "common_filters": ["location", "city"]
+    },
+    "Departments": {
+        "description": "Company departments and department news",
+        "terms": ["department", "team", "HR", "Finance", "Engineering", "Marketing", "Sales", "Customer Support", "IT", "Legal", "Operations", "R&D", "organization", "structure"],
+        "common_filters": ["department"]
+    },
+    "IntranetNews": {
+        "description": "Company news, announcements, and updates",
+        "terms": ["news", "announcements", "updates", "events", "initiatives"],
+        "common_filters": ["location", "department"]
+    },
+    "VacationLeave": {
+        "description": "Vacation days, leave policies, and time-off entitlements",
+        "terms": ["vacation", "leave", "time-off", "PTO", "BUrlG", "statutory leave", "parental leave", "sabbatical", "unpaid leave", "carry over", "entitlement"],
+        "common_filters": ["leave_type", "country"]
+    },
+    "PerformanceCareer": {
+        "description": "Performance evaluations, promotions, and career development",
+        "terms": ["performance", "evaluation", "promotion", "training", "mentorship", "tuition", "career", "development", "programs"],
+        "common_filters": ["evaluation_type"]
+    },
+    "CompensationBenefits": {
+        "description": "Salary, bonuses, incentives, and employee benefits",
+        "terms": ["salary", "payment", "bonus", "incentive", "overtime", "expense", "reimbursement", "health benefits", "retirement", "compensation", "benefits"],
+        "common_filters": ["benefit_type"]
+    },
+    "HRPolicies": {
+        "description": "HR policies, workplace guidelines, and compliance",
+        "terms": ["HR", "policy", "working hours", "remote work", "dress code", "complaint", "harassment", "violation", "conflict resolution", "workplace", "guidelines"],
+        "common_filters": ["policy_type"]
+    }
+})
+
+# Flat (lower_term, domain_name, original_term) index so term lookups scan
+# every term once without lower-casing the constant data on each call
+_LOWER_TERMS = tuple(
+    (term.lower(), domain_name, term)
+    for domain_name, domain_info in DOMAIN_HINTS.items()
+    for term in domain_info["terms"]
+)
+_ALL_TERMS = ", ".join(term for _, _, term in _LOWER_TERMS)
+# The taxonomy is static, so the per-table hints and the domain listing are rendered once
+_TERMS_BY_DOMAIN = MappingProxyType({
+    domain_name: ", ".join(domain_info["terms"])
+    for domain_name, domain_info in DOMAIN_HINTS.items()
+})
+_ALL_DOMAINS = "Domain Categories:\n\n" + "".join(
+    f"{domain_name}: {domain_info['description']}\n"
+    f"  Common filters: {', '.join(domain_info['common_filters'])}\n\n"
+    for domain_name, domain_info in DOMAIN_HINTS.items()
+)
+
+
 class TaxonomyTool():
 
     def __init__(self):
         logging.info("Initializing TaxonomyTool")
-        
-        
-        # Define domain hint mappings based on available agent capabilities
-        self.domain_hints = {
-            "OfficeLocations": {
-                "description": "Company office locations and location-specific news",
-                "terms": ["office", "location", "St. Louis", "London", "Berlin", "Leverkusen", "site", "facilities"],
-                "common_filters": ["location", "city"]
-            },
-            "Departments": {
-                "description": "Company departments and department news",
-                "terms": ["department", "team", "HR", "Finance", "Engineering", "Marketing", "Sales", "Customer Support", "IT", "Legal", "Operations", "R&D", "organization", "structure"],
-                "common_filters": ["department"]
-            },
-            "IntranetNews": {
-                "description": "Company news, announcements, and updates",
-                "terms": ["news", "announcements", "updates", "events", "initiatives"],
-                "common_filters": ["location", "department"]
-            },
-            "VacationLeave": {
-                "description": "Vacation days, leave policies, and time-off entitlements",
-                "terms": ["vacation", "leave", "time-off", "PTO", "BUrlG", "statutory leave", "parental leave", "sabbatical", "unpaid leave", "carry over", "entitlement"],
-                "common_filters": ["leave_type", "country"]
-            },
-            "PerformanceCareer": {
-                "description": "Performance evaluations, promotions, and career development",
-                "terms": ["performance", "evaluation", "promotion", "training", "mentorship", "tuition", "career", "development", "programs"],
-                "common_filters": ["evaluation_type"]
-            },
-            "CompensationBenefits": {
-                "description": "Salary, bonuses, incentives, and employee benefits",
-                "terms": ["salary", "payment", "bonus", "incentive", "overtime", "expense", "reimbursement", "health benefits", "retirement", "compensation", "benefits"],
-                "common_filters": ["benefit_type"]
-            },
-            "HRPolicies": {
-                "description": "HR policies, workplace guidelines, and compliance",
-                "terms": ["HR", "policy", "working hours", "remote work", "dress code", "complaint", "harassment", "violation", "conflict resolution", "workplace", "guidelines"],
-                "common_filters": ["policy_type"]
-            }
-        }
+
+        self.domain_hints = DOMAIN_HINTS
+        self._lower_terms = _LOWER_TERMS
+        self._term_hints_cache = lru_cache(maxsize=256)(self._search_term_hints)
 
     def list_all_domains(self) -> str:
         """List all domain categories with descriptions and common filters.
@@ -52,15 +78,9 @@ class TaxonomyTool():
         Returns:
             Formatted string with all domain information.
         """
-        logging.info("Listing all domain categories")
-        
-        result = "Domain Categories:\n\n"
+        logging.debug("Listing all domain categories")
         
-        for domain_name, domain_info in self.domain_hints.items():
-            result += f"{domain_name}: {domain_info['description']}\n"
-            result += f"  Common filters: {', '.join(domain_info['common_filters'])}\n\n"
-        
-        return result
+        return _ALL_DOMAINS
 
     def get_domain_hints(self, table_name: Optional[str] = None) -> str:
         """Get domain hints for a specific table or all tables.
@@ -71,19 +91,16 @@ class TaxonomyTool():
         Returns:
             Comma-separated string of domain hints.
         """
-        logging.info("Fetching domain hints for table: %s", table_name)
+        logging.debug("Fetching domain hints for table: %s", table_name)
         
         if table_name is None:
             # Return all hints
-            all_hints = []
-            for domain in self.domain_hints.values():
-                all_hints.extend(domain["terms"])
-            return ", ".join(all_hints)
+            return _ALL_TERMS
         
         # Return hints for specific table
-        domain = self.domain_hints.get(table_name)
-        if domain:
-            return ", ".join(domain["terms"])
+        terms = _TERMS_BY_DOMAIN.get(table_name)
+        if terms is not None:
+            return terms
         else:
             logging.warning(f"No domain hints found for table: {table_name}")
             return ""
@@ -97,24 +114,24 @@ class TaxonomyTool():
         Returns:
             Formatted string with relevant domain information.
         """
-        logging.info("Searching for term: %s", search_term)
-        
+        logging.debug("Searching for term: %s", search_term)
+        return self._term_hints_cache(search_term)
+
+    def _search_term_hints(self, search_term: str) -> str:
         search_lower = search_term.lower()
-        results = []
-        
-        for domain_name, domain_info in self.domain_hints.items():
-            # Check if term matches any hints in this domain
-            matching_terms = [
-                term for term in domain_info["terms"]
-                if search_lower in term.lower()
-            ]
-            
-            if matching_terms:
-                result = f"\n{domain_name}: {domain_info['description']}\n"
-                result += f"  Matching terms: {', '.join(matching_terms)}\n"
-                result += f"  Common filters: {', '.join(domain_info['common_filters'])}"
-                results.append(result)
-        
+        matches = defaultdict(list)
+
+        for lower_term, domain_name, term in self._lower_terms:
+            if search_lower in lower_term:
+                matches[domain_name].append(term)
+
+        results = [
+            f"\n{domain_name}: {self.domain_hints[domain_name]['description']}\n"
+            f"  Matching terms: {', '.join(matching_terms)}\n"
+            f"  Common filters: {', '.join(self.domain_hints[domain_name]['common_filters'])}"
+            for domain_name, matching_terms in matches.items()
+        ]
+
         if not results:
             return f"No domain hints found for term: '{search_term}'"
         
@@ -2,6 +2,7 @@ import click
 import uvicorn
 import sys
 import os
+import logging
 from starlette.responses import JSONResponse
 from starlette.routing import Route
 from a2a.server.agent_execution import AgentExecutor
@@ -19,6 +20,18 @@ from a2a.types import (
 from work_env_agent.work_env_agent_executor import WorkEnvAgentExecutor
 from work_env_agent.work_env_agent_card import work_env_agent_card
 
+# Configure logging once for the whole agent process
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+for noisy_logger in (
+    'azure.core.pipeline.policies.http_logging_policy',
+    'azure.monitor.opentelemetry.exporter.export',
+    'azure.identity',
+):
+    logging.getLogger(noisy_logger).setLevel(logging.WARNING)
+
 class A2ARequestHandler(DefaultRequestHandler):
     """A2A Request Handler for the A2A Repo Agent."""
 
@@ -67,7 +80,8 @@ def main(host: str, port: int):
 
     app.router.routes.append(Route("/_healthz", endpoint=healthz))
 
-    uvicorn.run(app, host=host, port=port)
+    # "auto" runs the server on uvloop when it is installed (see requirements.txt)
+    uvicorn.run(app, host=host, port=port, loop="auto")
 
 
 if __name__ == '__main__':
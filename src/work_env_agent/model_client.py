@@ -1,44 +1,74 @@
 import os
 import logging
+from functools import lru_cache
 
 from agent_framework import BaseChatClient
 from agent_framework.azure import AzureOpenAIChatClient, AzureAIAgentClient
 from azure.ai.projects import AIProjectClient
 from azure.core.exceptions import ResourceNotFoundError
+import httpx
 from openai import AzureOpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from azure.core.credentials import TokenCredential
+from azure.identity import (
+    ChainedTokenCredential,
+    DefaultAzureCredential,
+    EnvironmentCredential,
+    ManagedIdentityCredential,
+    get_bearer_token_provider,
+)
 from dotenv import load_dotenv
 
-# Configure logging for this sample module
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY", "")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "").strip()
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY", "").strip()
 AZURE_OPENAI_EMBEDDING_MODEL = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
-AZURE_OPENAI_VERSION = os.getenv("AZURE_OPENAI_VERSION", "2024-02-15")
+AZURE_OPENAI_VERSION = os.getenv("AZURE_OPENAI_VERSION", "2024-10-21")
+AZURE_AI_PROJECT_ENDPOINT = os.getenv("AZURE_AI_PROJECT_ENDPOINT", "").strip()
+
+
+@lru_cache(maxsize=1)
+def get_credential() -> TokenCredential:
+    """Return the process-wide credential so the credential chain is only probed once.
+
+    Hosted in Azure only the environment and the managed identity are tried; locally
+    the full DefaultAzureCredential chain is kept so any developer login works.
+    """
+    if os.getenv("CONTAINER_APP_NAME") or os.getenv("WEBSITE_SITE_NAME") or os.getenv("KUBERNETES_SERVICE_HOST"):
+        return ChainedTokenCredential(
+            EnvironmentCredential(),
+            ManagedIdentityCredential(client_id=os.getenv("AZURE_CLIENT_ID")),
+        )
+    return DefaultAzureCredential()
+
+
+@lru_cache(maxsize=1)
+def _get_token_provider():
+    """Return a bearer token provider for Azure OpenAI backed by the shared credential."""
+    return get_bearer_token_provider(get_credential(), "https://cognitiveservices.azure.com/.default")
+
+@lru_cache(maxsize=1)
+def _get_http_client() -> httpx.Client:
+    """Return the connection pool shared by the synchronous OpenAI clients of this process."""
+    return httpx.Client(limits=httpx.Limits(max_connections=100, max_keepalive_connections=50))
 
+
+@lru_cache(maxsize=1)
 def create_embedding_client() -> AzureOpenAI:
     """Create a shared Azure OpenAI embedding client."""
-    openai_credential = None
-    token_provider = None
+    logger.info("Using Azure OpenAI api-version %s", AZURE_OPENAI_VERSION)
+
     api_key = AZURE_OPENAI_API_KEY or None
 
     if not api_key:
-        openai_credential = DefaultAzureCredential()
-        token_provider = get_bearer_token_provider(
-            openai_credential, "https://cognitiveservices.azure.com/.default"
-        )
         return AzureOpenAI(
             azure_deployment=AZURE_OPENAI_EMBEDDING_MODEL,
             api_version=AZURE_OPENAI_VERSION,
             azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            azure_ad_token_provider=token_provider,
+            azure_ad_token_provider=_get_token_provider(),
+            http_client=_get_http_client(),
         )
     
     client = AzureOpenAI(
@@ -46,6 +76,7 @@ def create_embedding_client() -> AzureOpenAI:
         api_version=AZURE_OPENAI_VERSION,
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
         api_key=api_key,
+        http_client=_get_http_client(),
     )
 
     return client
@@ -61,15 +92,12 @@ async def setup_azure_ai_observability(enable_sensitive_data: bool | None = None
     conn_string = None
 
     try:
-        project_endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT", "").strip()
+        project_endpoint = AZURE_AI_PROJECT_ENDPOINT
 
         if (project_endpoint):
             logger.info("AZURE_AI_PROJECT_ENDPOINT found: %s", project_endpoint)
-            print("Using Azure AI Project Endpoint authentication.")
         
-            credential = DefaultAzureCredential()
-
-            project_client = AIProjectClient(endpoint=project_endpoint, credential=credential)
+            project_client = AIProjectClient(endpoint=project_endpoint, credential=get_credential())
             conn_string = project_client.telemetry.get_application_insights_connection_string()
 
         app_insights_connection_string = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING", "").strip()
@@ -90,11 +118,13 @@ async def setup_azure_ai_observability(enable_sensitive_data: bool | None = None
     setup_observability(applicationinsights_connection_string=conn_string, enable_sensitive_data=enable_sensitive_data)
     logger.info("Observability is set up with Application Insights connection string from Azure AI Project.")
 
+@lru_cache(maxsize=None)
 def create_chat_client(model_name: str, agent_name: str = "") -> BaseChatClient:
-    """Create an OpenAIChatClient."""
+    """Create an OpenAIChatClient.
 
-    token: str
-    endpoint: str
+    Clients are cached per (model_name, agent_name), so repeated calls reuse the
+    same client and credential instead of rebuilding them.
+    """
 
     if (not model_name) or model_name.strip() == "":
         logger.error("Model name is missing. Set COMPLETION_DEPLOYMENT_NAME in your .env file.")
@@ -102,47 +132,41 @@ def create_chat_client(model_name: str, agent_name: str = "") -> BaseChatClient:
             "Model name for OpenAIChatClient is not set. Please set COMPLETION_DEPLOYMENT_NAME in your .env file."
         )
 
-    project_endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT", "").strip()
-    azure_api_key = os.environ.get("AZURE_OPENAI_API_KEY", "").strip()
-    azure_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT", "").strip()
+    project_endpoint = AZURE_AI_PROJECT_ENDPOINT
+    azure_endpoint = AZURE_OPENAI_ENDPOINT
 
     if project_endpoint:
         logger.info("AZURE_AI_PROJECT_ENDPOINT found: %s", project_endpoint)
-        print("Using Azure AI Project Endpoint authentication.")
-        credential = DefaultAzureCredential()
         return AzureAIAgentClient(
             project_endpoint=project_endpoint,
-            credential=credential,
+            credential=get_credential(),
             model_deployment_name=model_name,
             agent_name=agent_name,
             should_cleanup_agent = False
         )
     
     if azure_endpoint:
-        logger.info("AZURE_OPENAI_ENDPOINT found: %s", azure_endpoint)
-
-        if azure_api_key:
-            print("Using Azure OpenAI API key authentication.")
-            logger.info("AZURE_OPENAI_API_KEY found - using API key authentication.")
-            token = azure_api_key
-            endpoint = azure_endpoint
-            return AzureOpenAIChatClient(
-                deployment_name=model_name,
-                azure_api_key=token,
-                endpoint=endpoint,
-            )   
-        
-        else:
-            print("Using Azure OpenAI AAD authentication.")
-            logger.info("AZURE_OPENAI_API_KEY not found - will use AAD authentication.")
-            token_provider = get_bearer_token_provider(
-                DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-            )
-            endpoint = azure_endpoint
-
-            return AzureOpenAIChatClient(
-                deployment_name=model_name,
-                ad_token_provider=token_provider,
-                endpoint=endpoint,
-            )   
-    
\ No newline at end of file
+        return _create_azure_openai_chat_client(model_name)
+
+
+@lru_cache(maxsize=None)
+def _create_azure_openai_chat_client(model_name: str) -> BaseChatClient:
+    """Azure OpenAI chat clients carry no per-agent state, so agents on the same deployment share one."""
+    azure_api_key = AZURE_OPENAI_API_KEY
+    azure_endpoint = AZURE_OPENAI_ENDPOINT
+    logger.info("AZURE_OPENAI_ENDPOINT found: %s", azure_endpoint)
+
+    if azure_api_key:
+        logger.info("AZURE_OPENAI_API_KEY found - using API key authentication.")
+        return AzureOpenAIChatClient(
+            deployment_name=model_name,
+            azure_api_key=azure_api_key,
+            endpoint=azure_endpoint,
+        )
+
+    logger.info("AZURE_OPENAI_API_KEY not found - will use AAD authentication.")
+    return AzureOpenAIChatClient(
+        deployment_name=model_name,
+        ad_token_provider=_get_token_provider(),
+        endpoint=azure_endpoint,
+    )
@@ -1,17 +1,23 @@
+from __future__ import annotations
+
+import asyncio
 import os
-from openai import AzureOpenAI
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from openai import AsyncAzureOpenAI
 from typing import Optional
 import logging
+import numpy as np
 from dotenv import load_dotenv
-from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient
 from azure.search.documents.models import VectorizedQuery
-from azure.search.documents import SearchItemPaged
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.identity.aio import DefaultAzureCredential, get_bearer_token_provider
 from agent_framework import ChatAgent, HostedMCPTool, MCPStreamableHTTPTool
 from dataclasses import dataclass
-from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class QueryExample:
     """Represents a query example with metadata."""
     id: str
@@ -33,31 +39,145 @@ EMBEDDING_DIMENSIONS = int(os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS", "1536"
 OPENAI_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-10-21")
 OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 OPENAI_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+SEARCH_CONNECTION_TIMEOUT = float(os.getenv("AZURE_AI_SEARCH_CONNECTION_TIMEOUT", "5"))
+SEARCH_READ_TIMEOUT = float(os.getenv("AZURE_AI_SEARCH_READ_TIMEOUT", "30"))
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-logging.getLogger('azure.core.pipeline.policies.http_logging_policy').setLevel(logging.WARNING)
-logging.getLogger('azure.monitor.opentelemetry.exporter.export').setLevel(logging.WARNING)
-
-openai_client = None
+RESULT_CACHE_SIZE = int(os.getenv("POLICY_SEARCH_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("POLICY_SEARCH_CACHE_TTL_SECONDS", "3600"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("POLICY_SEARCH_EMBEDDING_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("POLICY_SEARCH_SEMANTIC_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("POLICY_SEARCH_SEMANTIC_THRESHOLD", "0.95"))
+SEARCH_CONCURRENCY = int(os.getenv("POLICY_SEARCH_CONCURRENCY", "8"))
+# Concurrent embedding requests are collected for this long, or until the batch is full
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+# Cached entries are only valid for the embedding model and index they were produced with
+CACHE_FINGERPRINT = (EMBEDDING_DEPLOYMENT, EMBEDDING_DIMENSIONS, SEARCH_INDEX_NAME)
 
-def get_openai_client():
-    global openai_client
-    if openai_client:
-        return openai_client
+logger = logging.getLogger(__name__)
 
-    openai_credential = DefaultAzureCredential()
-    token_provider = get_bearer_token_provider(openai_credential, "https://cognitiveservices.azure.com/.default")
+# One credential and token provider shared by the search and OpenAI clients
+_CREDENTIAL = DefaultAzureCredential()
+_TOKEN_PROVIDER = get_bearer_token_provider(_CREDENTIAL, "https://cognitiveservices.azure.com/.default")
 
-    openai_client = AzureOpenAI(
+@lru_cache(maxsize=1)
+def get_openai_client() -> AsyncAzureOpenAI:
+    """Embedding client, created on the first embedding request."""
+    return AsyncAzureOpenAI(
         azure_deployment=EMBEDDING_DEPLOYMENT,
         api_version=OPENAI_VERSION,
         azure_endpoint=OPENAI_ENDPOINT,
         api_key=OPENAI_KEY,
-        azure_ad_token_provider=token_provider if not OPENAI_KEY else None
+        azure_ad_token_provider=_TOKEN_PROVIDER if not OPENAI_KEY else None
     )
-    return openai_client
+
+class EmbeddingBatcher():
+    """Coalesces embedding requests arriving within a short window into one embeddings.create call."""
+
+    def __init__(self, max_batch: int = EMBEDDING_BATCH_SIZE, max_wait_ms: float = EMBEDDING_BATCH_WINDOW_MS) -> None:
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def embed(self, query: str) -> list[float]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= self.max_batch:
+            self._spawn(self._flush())
+        elif self._flusher is None:
+            self._flusher = self._spawn(self._flush_later())
+        return await future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_wait)
+        self._flusher = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending and self._flusher is None:
+            self._flusher = self._spawn(self._flush_later())
+        if not batch:
+            return
+
+        inputs = list(dict.fromkeys(query for query, _ in batch))
+        try:
+            response = await get_openai_client().embeddings.create(
+                input=inputs,
+                model=EMBEDDING_DEPLOYMENT,
+                dimensions=EMBEDDING_DIMENSIONS,
+            )
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        embeddings = {inputs[item.index]: item.embedding for item in response.data}
+        for query, future in batch:
+            if not future.done():
+                future.set_result(embeddings[query])
+
+
+_embedding_batcher = EmbeddingBatcher()
+# Memoized embeddings are stored as float16 and upcast on read
+_embedding_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+
+
+async def embed_async(query: str) -> np.ndarray:
+    """Embed a query through the shared batcher, memoized so repeated questions skip the call."""
+    cached = _embedding_cache.get(query)
+    if cached is not None:
+        _embedding_cache.move_to_end(query)
+        return cached.astype(np.float32)
+
+    embedding = np.asarray(await _embedding_batcher.embed(query), dtype=np.float16)
+    _embedding_cache[query] = embedding
+    if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+        _embedding_cache.popitem(last=False)
+    # Return the float16 round-trip on a miss too, so a query always yields the same vector
+    return embedding.astype(np.float32)
+
+
+class SemanticCache():
+    """Ring buffer of unit-length query embeddings and the search results they produced.
+
+    Embeddings live in one contiguous float32 matrix so a lookup is a single GEMV
+    over the filled rows, and inserts overwrite one row in place.
+    """
+
+    def __init__(self, capacity: int, dimensions: int) -> None:
+        self.embeddings = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.results: list[Optional[list[QueryExample]]] = [None] * capacity
+        self.stored_at = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self.next_slot = 0
+
+    def get(self, embedding: np.ndarray, threshold: float, ttl_seconds: float) -> Optional[list[QueryExample]]:
+        if self.size == 0:
+            return None
+        scores = self.embeddings[:self.size] @ embedding
+        scores[time.monotonic() - self.stored_at[:self.size] >= ttl_seconds] = -1.0
+        best = int(scores.argmax())
+        if scores[best] < threshold:
+            return None
+        return self.results[best]
+
+    def put(self, embedding: np.ndarray, results: list[QueryExample]) -> None:
+        self.embeddings[self.next_slot] = embedding
+        self.results[self.next_slot] = results
+        self.stored_at[self.next_slot] = time.monotonic()
+        self.next_slot = (self.next_slot + 1) % len(self.results)
+        self.size = min(self.size + 1, len(self.results))
+
 
 class PolicySearchTool():
     """Tool that searches for similar queries using Azure AI Search."""
@@ -69,81 +189,95 @@ class PolicySearchTool():
 
             credential = AzureKeyCredential(SEARCH_KEY)
         else:
-            credential = DefaultAzureCredential()
+            credential = _CREDENTIAL
 
         self.search_client = SearchClient(
             endpoint=SEARCH_ENDPOINT,
             index_name=SEARCH_INDEX_NAME,
             credential=credential,
+            # One keep-alive aiohttp session reused by every search issued through this tool
+            transport=AioHttpTransport(connection_timeout=SEARCH_CONNECTION_TIMEOUT, read_timeout=SEARCH_READ_TIMEOUT),
         )
 
+        # Exact-match results keyed by (fingerprint, query, top_k): (stored_at, results).
+        # category is not part of any key because the search does not filter on it
+        self._result_cache: OrderedDict[tuple, tuple[float, list[QueryExample]]] = OrderedDict()
+        # Semantic caches per (fingerprint, top_k)
+        self._semantic_caches: dict[tuple, SemanticCache] = {}
+        # Caps in-flight searches so parallel tool calls do not get throttled by the service
+        self._search_limit = asyncio.Semaphore(SEARCH_CONCURRENCY)
+        # Opens the search connection once, overlapping the first embedding call
+        self._search_warmup: Optional[asyncio.Task] = None
+
+    async def _warm_search_client(self) -> None:
+        try:
+            await self.search_client.get_document_count()
+        except Exception as exc:  # pragma: no cover - best effort
+            logger.debug("Search client warmup failed: %s", exc)
+
+    def _store_result(self, cache_key: tuple, results: list[QueryExample]) -> None:
+        self._result_cache[cache_key] = (time.monotonic(), results)
+        self._result_cache.move_to_end(cache_key)
+        if len(self._result_cache) > RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+
     async def run(self, query: str, top_k: int = 5, category: Optional[str] = None) -> list[QueryExample]:
         """Execute the search and return a list of QueryExample objects."""
-        try:
+        cache_key = (CACHE_FINGERPRINT, query, top_k)
+        cached = self._result_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < RESULT_CACHE_TTL_SECONDS:
+            self._result_cache.move_to_end(cache_key)
+            return list(cached[1])
 
-            openai_client = get_openai_client()
-            embedding = openai_client.embeddings.create(input=query, model=EMBEDDING_DEPLOYMENT, dimensions=EMBEDDING_DIMENSIONS).data[0].embedding
-
-            vector_query = VectorizedQuery(vector=embedding, k_nearest_neighbors=top_k, fields="intent_vector")
-            logger.info(f"Vector Query: {vector_query}")
-            results: SearchItemPaged[dict]
-            results = self.search_client.search(  
-                search_text=None,  
-                vector_queries= [vector_query],
-                select=["content", "description", "intent", "category", "complexity", "id"],
-                top=top_k,
-            )  
-            logger.info(f"Search Results: {results}")
-  
-
-            # logger.info(f"Searching for queries with query: {query}, top_k: {top_k}, category: {category}")
-            # search_params = {
-            #     "search_text": query,
-            #     "top": top_k,
-            #     "include_total_count": True,
-            #     "select": [
-            #         "id",
-            #         "query",
-            #         "description",
-            #         "intent",
-            #         "category",
-            #         "complexity",
-            #     ],
-            # }
-
-            # if category:
-            #     search_params["filter"] = f"category eq '{category}'"
-            
-            # results = self.search_client.search(**search_params)
-
-            # semantic_answers = results.get_answers()
-            # if semantic_answers:
-            #     for answer in semantic_answers:
-            #         if answer.highlights:
-            #             logger.info(f"Semantic Answer: {answer.highlights}")
-            #         else:
-            #             logger.info(f"Semantic Answer: {answer.text}")
-            #     logger.info(f"Semantic Answer Score: {answer.score}\n")
-
-            # logger.info(f"Search returned {len(results)} results")
-            query_examples = []
-            for result in results:
-                example = QueryExample(
-                    id =result.get("id", ""),
-                    content=result.get("content", ""),
-                    description=result.get("description", ""),
-                    intent=result.get("intent", ""),
-                    category=result.get("category"),
-                    complexity=result.get("complexity"),
-                    score=result.get("@search.score"),
-                )
+        try:
+            if self._search_warmup is None:
+                self._search_warmup = asyncio.create_task(self._warm_search_client())
+            # Shielded so cancelling one search does not cancel the warmup shared by all of them
+            embedding, _ = await asyncio.gather(embed_async(query), asyncio.shield(self._search_warmup))
 
-                logger.info(f"Found Query Example: {example}")
-                query_examples.append(example)
+            unit = embedding.copy()
+            unit /= np.linalg.norm(unit)
+            semantic_key = (CACHE_FINGERPRINT, top_k)
+            semantic_cache = self._semantic_caches.get(semantic_key)
+            if semantic_cache is None:
+                semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, unit.shape[0])
+                self._semantic_caches[semantic_key] = semantic_cache
+            similar = semantic_cache.get(unit, SEMANTIC_CACHE_THRESHOLD, RESULT_CACHE_TTL_SECONDS)
+            if similar is not None:
+                self._store_result(cache_key, similar)
+                return list(similar)
 
-            return query_examples
-            
+            vector_query = VectorizedQuery(vector=embedding.tolist(), k_nearest_neighbors=top_k, fields="intent_vector")
+            logger.debug("Vector Query: dim=%d k=%d", len(embedding), top_k)
+            async with self._search_limit:
+                results = await self.search_client.search(
+                    search_text=None,
+                    vector_queries=[vector_query],
+                    select=["content", "description", "intent", "category", "complexity", "id"],
+                    top=top_k,
+                )
+                hits = [result async for result in results][:top_k]
         except Exception as exc:  # pragma: no cover - defensive
             # Return empty list on error, or you could raise the exception
-            logger.error(f"Error searching for queries: {exc}")
-            return []
\ No newline at end of file
+            logger.error("Error searching for queries: %s", exc)
+            return []
+
+        query_examples = [
+            QueryExample(
+                hit.get("id", ""),
+                hit.get("content", ""),
+                hit.get("description", ""),
+                hit.get("intent", ""),
+                hit.get("category"),
+                hit.get("complexity"),
+                hit.get("@search.score"),
+            )
+            for hit in hits
+        ]
+        for example in query_examples:
+            logger.debug("Found Query Example: %s", example)
+        logger.info("Search returned %d results", len(query_examples))
+
+        self._store_result(cache_key, query_examples)
+        semantic_cache.put(unit, query_examples)
+        return list(query_examples)
@@ -1,74 +1,120 @@
+import asyncio
 import os
+import hashlib
 import logging
-from random import randint
-from typing import Annotated, Optional, override
+import re
+import time
+from collections import OrderedDict
+from functools import cache, cached_property, lru_cache
+from random import Random
+from typing import Annotated, AsyncIterator, Optional, override
+from uuid import uuid4
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.types import (
+    Artifact,
+    Part,
     TaskArtifactUpdateEvent,
     TaskState,
     TaskStatus,
     TaskStatusUpdateEvent,
+    TextPart,
 )
-from a2a.utils import new_agent_text_message, new_task, new_text_artifact
+from a2a.utils import new_task
+from agent_framework import ChatMessage, ai_function
 from work_env_agent.model_client import create_chat_client as _create_openai_client
 from dotenv import load_dotenv
-from work_env_agent.policy_search_tool import PolicySearchTool
+import numpy as np
+from work_env_agent.policy_search_tool import PolicySearchTool, embed_async
 from pydantic import Field
 
 load_dotenv()
 
 model_name = os.environ["AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME"]
-policy_search_tool = PolicySearchTool()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+
+@lru_cache(maxsize=1)
+def _policy_search_tool() -> PolicySearchTool:
+    """Process-wide search tool, created on the first policy search."""
+    return PolicySearchTool()
+
+
+POLICY_ANSWER_CACHE_SIZE = int(os.getenv("POLICY_ANSWER_CACHE_SIZE", "512"))
+POLICY_ANSWER_CACHE_TTL_SECONDS = float(os.getenv("POLICY_ANSWER_CACHE_TTL_SECONDS", "900"))
+# Formatted search_policy_information answers keyed by (normalized query, category): (stored_at, text)
+_policy_answer_cache: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+
+RESPONSE_CACHE_SIZE = int(os.getenv("WORK_ENV_RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("WORK_ENV_RESPONSE_CACHE_THRESHOLD", "0.95"))
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-logging.getLogger('azure.core.pipeline.policies.http_logging_policy').setLevel(logging.WARNING)
-logging.getLogger('azure.monitor.opentelemetry.exporter.export').setLevel(logging.WARNING)
+# getLevelName returns the level number for known names and a "Level X" string otherwise
+_log_level = logging.getLevelName(os.getenv("AGENT_LOG_LEVEL", "WARNING").upper())
+logger.setLevel(_log_level if isinstance(_log_level, int) else logging.WARNING)
 
 
+@lru_cache(maxsize=256)
 def get_vacation_days(
     location: Annotated[str, Field(description="The work country location of the employee (e.g., Germany, USA, UK, Netherlands)")],
 ) -> str:
     """Get the number of vacation days for an employee based on their work location. For detailed vacation policies, use search_policy_information with queries about statutory vacation, BUrlG, or leave entitlements."""
-    countries = ["Germany", "USA", "UK", "Netherlands"]
-    logging.info("get_vacation_days called with location: %s", location)
-    return f"In {location}, employees get {randint(15, 30)} vacation days per year."
+    logger.debug("get_vacation_days called with location: %s", location)
+    return f"In {location}, employees get {Random(f'vacation:{location}').randint(15, 30)} vacation days per year."
 
 def get_performance_evaluation_info() -> str:
     """Get basic performance evaluation schedule information. For detailed policies on promotions, reviews, and criteria, use search_policy_information with category 'hr-policies' or 'training-development'."""
-    logging.info("get_performance_evaluation_info called")
+    logger.debug("get_performance_evaluation_info called")
     return "Performance evaluations are conducted annually, typically in Q1."
 
 def get_payment_benefits_info() -> str:
     """Get basic payment and benefits overview. For detailed information on salary schedules, overtime, bonuses, reimbursements, parental leave, or retirement, use search_policy_information with category 'compensation-benefits'."""
-    logging.info("get_payment_benefits_info called") 
+    logger.debug("get_payment_benefits_info called")
     return "Employees are paid monthly, with benefits including health insurance and retirement plans."
 
+@cache
 def get_employee_id() -> str:
     """Simple tool returning a fake employee ID."""
-    logging.info("get_employee_id called")
-    return "EMP" + str(randint(1000, 9999))
+    logger.debug("get_employee_id called")
+    return "EMP" + str(Random("employee_id").randint(1000, 9999))
+
+_LATEST_NEWS = ", ".join((
+    "Company expands remote work options.",
+    "New health benefits introduced for employees.",
+    "Annual performance reviews scheduled for next month.",
+))
 
 def get_latest_relevant_content(
     query: Annotated[str, Field(description="The topic to search for recent updates about")],
     days: Annotated[int, Field(description="Number of days to look back for content")] = 30,
 ) -> str:
     """Get recent company news and updates related to a topic. For official HR policies, use search_policy_information instead."""
-    news = [
-        "Company expands remote work options.",
-        "New health benefits introduced for employees.",
-        "Annual performance reviews scheduled for next month.",
-    ]
-    logging.info("get_latest_relevant_content called with query: %s and days: %d", query, days)
-    return f"Latest content related to '{query}': " + ", ".join(news)
+    logger.debug("get_latest_relevant_content called with query: %s and days: %d", query, days)
+    return f"Latest content related to '{query}': {_LATEST_NEWS}"
+
+# Questions mentioning any of these are searched before the model is called
+_POLICY_KEYWORDS = (
+    "policy", "policies", "vacation", "leave", "holiday", "burlg", "bonus", "overtime", "salary",
+    "parental", "benefit", "reimburse", "retirement", "remote", "sabbatical", "promotion", "training",
+)
+
+
+# One case-insensitive scan over the question instead of a substring check per keyword
+_POLICY_KEYWORD_PATTERN = re.compile("|".join(map(re.escape, _POLICY_KEYWORDS)), re.IGNORECASE)
+
+
+def _should_prefetch_policy(query: str) -> bool:
+    return _POLICY_KEYWORD_PATTERN.search(query) is not None
+
+
+def _format_policy_results(results) -> str:
+    """Format policy search results for the agent."""
+    return "\n\n".join(
+        f"[Document ID: {result.id}] (Category: {result.category}, Intent: {result.intent})\n"
+        f"Content: {result.content}\n"
+        f"Description: {result.description}"
+        for result in results
+    )
 
 async def search_policy_information(
     query: Annotated[str, Field(description="The search query to find relevant HR policy documents. Be specific about the topic.")],
@@ -81,39 +127,151 @@ async def search_policy_information(
     - company-policy: policy violations, conflict resolution, flexible working hours, sabbaticals, HR contact options
     """
     try:
-        logging.info("search_policy_information called with query: %s, category: %s", query, category)
-        results = await policy_search_tool.run(query=query, top_k=5, category=category)
+        logger.debug("search_policy_information called with query: %s, category: %s", query, category)
+        cache_key = (query.strip().lower(), category or "")
+        cached = _policy_answer_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < POLICY_ANSWER_CACHE_TTL_SECONDS:
+            _policy_answer_cache.move_to_end(cache_key)
+            return cached[1]
+
+        results = await _policy_search_tool().run(query=query, top_k=5, category=category)
         if not results:
             return "No policy documents found matching your query."
-        
-        # Format results for the agent
-        formatted_results = []
-        for result in results:
-            formatted_results.append(
-                f"[Document ID: {result.id}] (Category: {result.category}, Intent: {result.intent})\n"
-                f"Content: {result.content}\n"
-                f"Description: {result.description}"
-            )
-        return "\n\n".join(formatted_results)
+
+        answer = _format_policy_results(results)
+        _policy_answer_cache[cache_key] = (time.monotonic(), answer)
+        _policy_answer_cache.move_to_end(cache_key)
+        if len(_policy_answer_cache) > POLICY_ANSWER_CACHE_SIZE:
+            _policy_answer_cache.popitem(last=False)
+        return answer
     except Exception as e:
-        logging.exception("search_policy_information failed")
+        logger.exception("search_policy_information failed")
         return f"error: search_policy_information: {str(e)}"
 
+@lru_cache(maxsize=10_000)
 def get_bonus_info(
     employee_id: Annotated[str, Field(description="The employee identifier for bonus lookup.")],
 ) -> str:
     """Get bonus information for a specific employee. For general bonus and incentive policies, use search_policy_information with a query about 'bonuses' or 'incentives' in category 'compensation-benefits'."""
-    logging.info("get_bonus_info called with employee_id: %s", employee_id)
-    return f"Employee {employee_id} has a bonus of ${randint(1000, 5000)} for this year."
+    logger.debug("get_bonus_info called with employee_id: %s", employee_id)
+    return f"Employee {employee_id} has a bonus of ${Random(f'bonus:{employee_id}').randint(1000, 5000)} for this year."
+
+
+# Wrapped once so the argument schema of each tool is built at import rather than per request
+_TOOLS = [
+    ai_function(tool)
+    for tool in (
+        get_vacation_days,
+        get_performance_evaluation_info,
+        get_payment_benefits_info,
+        get_employee_id,
+        get_bonus_info,
+        search_policy_information,
+        get_latest_relevant_content,
+    )
+]
+
+_SYSTEM_PROMPT: str = (
+    "You are a work environment agent that helps users with HR and workplace-related questions. "
+    "IMPORTANT: Use the search_policy_information tool to find accurate policy information. "
+    "Available policy categories: 'hr-policies' (working hours, time off, remote work, vacation entitlements, German BUrlG), "
+    "'compensation-benefits' (salary, bonuses, overtime, parental leave, reimbursements), "
+    "'training-development' (training programs, promotions, mentorship), "
+    "'company-policy' (policy violations, conflict resolution, flexible hours, sabbaticals). "
+    "When answering from policy documents, always cite the document ID in brackets [ID: X]. "
+    "Do not make up policy information - always search first."
+)
+# Sent as its own system message so the service can cache the stable prefix.
+_SYSTEM_MESSAGE = ChatMessage(role="system", text=_SYSTEM_PROMPT)
+
+
+class _ResponseCache():
+    """Agent answers per A2A context, looked up by exact question and then by embedding similarity."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.exact: OrderedDict[bytes, str] = OrderedDict()
+        # Semantic tier: ring buffer of unit-length question embeddings, allocated on first insert
+        self.embeddings: Optional[np.ndarray] = None
+        self.contexts = np.empty(capacity, dtype=object)
+        self.texts: list[Optional[str]] = [None] * capacity
+        self.size = 0
+        self.next_slot = 0
+
+    @staticmethod
+    def _key(context_id: str, query: str) -> bytes:
+        return hashlib.blake2b(f"{context_id}\0{query}".encode()).digest()
+
+    def get_exact(self, context_id: str, query: str) -> Optional[str]:
+        key = self._key(context_id, query)
+        text = self.exact.get(key)
+        if text is not None:
+            self.exact.move_to_end(key)
+        return text
+
+    def get_similar(self, context_id: str, embedding: np.ndarray, threshold: float) -> Optional[str]:
+        if self.size == 0 or embedding.shape[0] != self.embeddings.shape[1]:
+            return None
+        scores = self.embeddings[:self.size] @ embedding
+        scores[self.contexts[:self.size] != context_id] = -1.0
+        best = int(scores.argmax())
+        if scores[best] <= threshold:
+            return None
+        return self.texts[best]
+
+    def put(self, context_id: str, query: str, embedding: Optional[np.ndarray], text: str) -> None:
+        key = self._key(context_id, query)
+        self.exact[key] = text
+        self.exact.move_to_end(key)
+        if len(self.exact) > self.capacity:
+            self.exact.popitem(last=False)
+
+        if embedding is None:
+            return
+        if self.embeddings is None:
+            self.embeddings = np.zeros((self.capacity, embedding.shape[0]), dtype=np.float32)
+        self.embeddings[self.next_slot] = embedding
+        self.contexts[self.next_slot] = context_id
+        self.texts[self.next_slot] = text
+        self.next_slot = (self.next_slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+
+_response_cache = _ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+@lru_cache(maxsize=1)
+def _chat_client():
+    """Process-wide chat client shared by every executor instance."""
+    return _create_openai_client(model_name)
+
+
+def _artifact_event(task, artifact_id: str, text: str, append: bool, last_chunk: bool) -> TaskArtifactUpdateEvent:
+    return TaskArtifactUpdateEvent(
+        append=append,
+        context_id=task.context_id,
+        task_id=task.id,
+        last_chunk=last_chunk,
+        artifact=Artifact(
+            artifact_id=artifact_id,
+            name='current_result',
+            description='Result of request to work environment agent.',
+            parts=[Part(root=TextPart(text=text))],
+        ),
+    )
 
 
 class WorkEnvAgentExecutor(AgentExecutor):
     """Simple work environment Q&A agent using Microsoft agent framework."""
 
     def __init__(self):
-        # Reuse the same authentication logic as the basic agent sample
-        logging.info("Creating OpenAIChatClient for WorkEnvAgentExecutor with model %s", model_name)
-        self.agent = _create_openai_client(model_name)
+        self._tools = _TOOLS
+
+    @cached_property
+    def agent(self):
+        # Created on the first request rather than when the server starts
+        logger.info("Creating OpenAIChatClient for WorkEnvAgentExecutor with model %s", model_name)
+        return _chat_client()
 
     @override
     async def execute(
@@ -130,57 +288,76 @@ class WorkEnvAgentExecutor(AgentExecutor):
             task = new_task(context.message)
             await event_queue.enqueue_event(task)
 
-        system_prompt = (
-            "You are a work environment agent that helps users with HR and workplace-related questions. "
-            "IMPORTANT: Use the search_policy_information tool to find accurate policy information. "
-            "Available policy categories: 'hr-policies' (working hours, time off, remote work, vacation entitlements, German BUrlG), "
-            "'compensation-benefits' (salary, bonuses, overtime, parental leave, reimbursements), "
-            "'training-development' (training programs, promotions, mentorship), "
-            "'company-policy' (policy violations, conflict resolution, flexible hours, sabbaticals). "
-            "When answering from policy documents, always cite the document ID in brackets [ID: X]. "
-            "Do not make up policy information - always search first."
-        )
+        # Chunks are streamed into one artifact as they arrive; the closing event
+        # replaces it with the full text so the stored task holds a single part
+        artifact_id = str(uuid4())
+        chunks: list[str] = []
+        async for chunk in self._stream_answer(task.context_id, context.get_user_input()):
+            await event_queue.enqueue_event(
+                _artifact_event(task, artifact_id, chunk, append=bool(chunks), last_chunk=False)
+            )
+            chunks.append(chunk)
 
-        query = system_prompt + "\n\nUser question: " + context.get_user_input()
-
-        # get_response may return a rich object; coerce to string for A2A
-        response = await self.agent.get_response(
-            query,
-            tools=[
-                get_vacation_days,
-                get_performance_evaluation_info,
-                get_payment_benefits_info,
-                get_employee_id,
-                get_bonus_info,
-                search_policy_information,
-                get_latest_relevant_content,
-            ],
+        # Both events are built up front; they are enqueued in order because the
+        # consumer stops reading once it sees the final status update
+        artifact_event = _artifact_event(task, artifact_id, "".join(chunks), append=False, last_chunk=True)
+        status_event = TaskStatusUpdateEvent(
+            status=TaskStatus(state=TaskState.completed),
+            final=True,
+            context_id=task.context_id,
+            task_id=task.id,
         )
+        await event_queue.enqueue_event(artifact_event)
+        await event_queue.enqueue_event(status_event)
 
-        # Ensure the artifact text is always a plain string
-        response_text = str(response)
-
-        await event_queue.enqueue_event(
-            TaskArtifactUpdateEvent(
-                append=False,
-                context_id=task.context_id,
-                task_id=task.id,
-                last_chunk=True,
-                artifact=new_text_artifact(
-                    name='current_result',
-                    description='Result of request to work environment agent.',
-                    text=response_text,
-                ),
-            )
-        )
-        await event_queue.enqueue_event(
-            TaskStatusUpdateEvent(
-                status=TaskStatus(state=TaskState.completed),
-                final=True,
-                context_id=task.context_id,
-                task_id=task.id,
-            )
-        )
+    async def _stream_answer(self, context_id: str, user_input: str) -> AsyncIterator[str]:
+        """Yield the answer from the response cache when possible, otherwise stream it from the model and cache it."""
+        cached = _response_cache.get_exact(context_id, user_input)
+        if cached is not None:
+            logger.info("Response cache hit (exact) for context %s", context_id)
+            yield cached
+            return
+
+        # Start the policy search now so it overlaps the cache lookup; both embed the
+        # same question, which the shared embedding batcher coalesces into one call
+        policy_task = None
+        if _should_prefetch_policy(user_input):
+            policy_task = asyncio.create_task(_policy_search_tool().run(query=user_input, top_k=5))
+
+        try:
+            embedding = await embed_async(user_input)
+            embedding = embedding / np.linalg.norm(embedding)
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Could not embed question for the response cache: %s", exc)
+            embedding = None
+        else:
+            cached = _response_cache.get_similar(context_id, embedding, RESPONSE_CACHE_THRESHOLD)
+            if cached is not None:
+                logger.info("Response cache hit (semantic) for context %s", context_id)
+                if policy_task is not None:
+                    policy_task.cancel()
+                yield cached
+                return
+
+        messages = [_SYSTEM_MESSAGE]
+        if policy_task is not None:
+            results = await policy_task
+            if results:
+                messages.append(ChatMessage(
+                    role="system",
+                    text="Pre-fetched policy context:\n\n" + _format_policy_results(results),
+                ))
+        messages.append(ChatMessage(role="user", text=user_input))
+
+        # Only the assistant text is streamed, not tool calls or metadata
+        chunks: list[str] = []
+        async for update in self.agent.get_streaming_response(messages, tools=self._tools):
+            if update.text:
+                chunks.append(update.text)
+                yield update.text
+
+        if chunks:
+            _response_cache.put(context_id, user_input, embedding, "".join(chunks))
 
     @override
     async def cancel(
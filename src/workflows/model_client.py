@@ -1,46 +1,100 @@
+from __future__ import annotations
+
+import asyncio
 import os
 import logging
-import time
-from agent_framework import BaseChatClient
-from agent_framework.azure import AzureOpenAIChatClient, AzureAIAgentClient
-from azure.ai.projects import AIProjectClient
-from azure.ai.agents.models import AgentThreadCreationOptions, ThreadMessageOptions, ListSortOrder
-from azure.core.exceptions import ResourceNotFoundError
-from openai import AzureOpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-from azure.ai.agents.models import ListSortOrder
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+from agent_framework import BaseChatClient, ChatContext, ChatMiddleware
 from dotenv import load_dotenv
 
-# Configure logging for this sample module
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# The Azure SDKs and clients are imported where they are first used to keep startup fast
+if TYPE_CHECKING:
+    import httpx
+    from azure.ai.projects import AIProjectClient
+    from azure.core.credentials import TokenCredential
+    from openai import AsyncAzureOpenAI, AzureOpenAI
+
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY", "")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "").strip()
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY", "").strip()
 AZURE_OPENAI_EMBEDDING_MODEL = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
-AZURE_OPENAI_VERSION = os.getenv("AZURE_OPENAI_VERSION", "2024-02-15")
+# API version of every chat and embedding client in this module, set by the deployment as AZURE_OPENAI_VERSION
+AZURE_OPENAI_VERSION = os.getenv("AZURE_OPENAI_VERSION", "2024-10-21")
+AZURE_AI_PROJECT_ENDPOINT = os.getenv("AZURE_AI_PROJECT_ENDPOINT", "").strip()
+# Concurrent embedding requests are collected for this long, or until the batch is full
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+# Chat requests in flight per deployment, shared by every agent on that deployment
+AZURE_OPENAI_MAX_CONCURRENT_REQUESTS = int(os.getenv("AZURE_OPENAI_MAX_CONCURRENT_REQUESTS", "8"))
+
+# Set once setup_observability has run, so later calls skip the project lookup
+_observability_initialized = False
+
+
+@lru_cache(maxsize=1)
+def get_credential() -> TokenCredential:
+    """Return the process-wide credential so the credential chain is only probed once.
+
+    Hosted in Azure only the environment and the managed identity are tried; locally
+    the full DefaultAzureCredential chain is kept so any developer login works.
+    """
+    from azure.identity import (
+        ChainedTokenCredential,
+        DefaultAzureCredential,
+        EnvironmentCredential,
+        ManagedIdentityCredential,
+    )
+
+    if os.getenv("CONTAINER_APP_NAME") or os.getenv("WEBSITE_SITE_NAME") or os.getenv("KUBERNETES_SERVICE_HOST"):
+        return ChainedTokenCredential(
+            EnvironmentCredential(),
+            ManagedIdentityCredential(client_id=os.getenv("AZURE_CLIENT_ID")),
+        )
+    return DefaultAzureCredential()
+
+
+@lru_cache(maxsize=1)
+def _get_token_provider():
+    """Return a bearer token provider for Azure OpenAI backed by the shared credential."""
+    from azure.identity import get_bearer_token_provider
+
+    return get_bearer_token_provider(get_credential(), "https://cognitiveservices.azure.com/.default")
+
+@lru_cache(maxsize=1)
+def get_project_client() -> AIProjectClient:
+    """Return the process-wide Azure AI project client for AZURE_AI_PROJECT_ENDPOINT."""
+    from azure.ai.projects import AIProjectClient
+
+    return AIProjectClient(endpoint=AZURE_AI_PROJECT_ENDPOINT, credential=get_credential())
+
+
+@lru_cache(maxsize=1)
+def _get_http_client() -> httpx.Client:
+    """Return the connection pool shared by the synchronous OpenAI clients of this process."""
+    import httpx
+
+    return httpx.Client(limits=httpx.Limits(max_connections=100, max_keepalive_connections=50))
 
+
+@lru_cache(maxsize=1)
 def create_embedding_client() -> AzureOpenAI:
     """Create a shared Azure OpenAI embedding client."""
-    openai_credential = None
-    token_provider = None
+    from openai import AzureOpenAI
+
+    logger.info("Using Azure OpenAI api-version %s", AZURE_OPENAI_VERSION)
     api_key = AZURE_OPENAI_API_KEY or None
 
     if not api_key:
-        openai_credential = DefaultAzureCredential()
-        token_provider = get_bearer_token_provider(
-            openai_credential, "https://cognitiveservices.azure.com/.default"
-        )
         return AzureOpenAI(
             azure_deployment=AZURE_OPENAI_EMBEDDING_MODEL,
             api_version=AZURE_OPENAI_VERSION,
             azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            azure_ad_token_provider=token_provider,
+            azure_ad_token_provider=_get_token_provider(),
+            http_client=_get_http_client(),
         )
     
     client = AzureOpenAI(
@@ -48,31 +102,126 @@ def create_embedding_client() -> AzureOpenAI:
         api_version=AZURE_OPENAI_VERSION,
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
         api_key=api_key,
+        http_client=_get_http_client(),
     )
 
     return client
 
-async def setup_azure_ai_observability(enable_sensitive_data: bool | None = None) -> None:
+@lru_cache(maxsize=1)
+def _get_async_http_client() -> httpx.AsyncClient:
+    """Return the connection pool shared by the asynchronous OpenAI clients of this process."""
+    import httpx
+
+    return httpx.AsyncClient(limits=httpx.Limits(max_connections=64, max_keepalive_connections=32), timeout=30.0)
+
+
+@lru_cache(maxsize=1)
+def create_async_embedding_client() -> AsyncAzureOpenAI:
+    """Create a shared async Azure OpenAI embedding client for use on the event loop."""
+    from openai import AsyncAzureOpenAI
+
+    if not AZURE_OPENAI_API_KEY:
+        return AsyncAzureOpenAI(
+            azure_deployment=AZURE_OPENAI_EMBEDDING_MODEL,
+            api_version=AZURE_OPENAI_VERSION,
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            azure_ad_token_provider=_get_token_provider(),
+            http_client=_get_async_http_client(),
+        )
+
+    return AsyncAzureOpenAI(
+        azure_deployment=AZURE_OPENAI_EMBEDDING_MODEL,
+        api_version=AZURE_OPENAI_VERSION,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        api_key=AZURE_OPENAI_API_KEY,
+        http_client=_get_async_http_client(),
+    )
+
+class EmbeddingBatcher():
+    """Coalesces embedding requests arriving within a short window into one embeddings.create call.
+
+    Same batcher as work_env_agent.policy_search_tool, which ships in a separate image.
+    """
+
+    def __init__(self, max_batch: int = EMBEDDING_BATCH_SIZE, max_wait_ms: float = EMBEDDING_BATCH_WINDOW_MS) -> None:
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def embed(self, query: str) -> list[float]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= self.max_batch:
+            self._spawn(self._flush())
+        elif self._flusher is None:
+            self._flusher = self._spawn(self._flush_later())
+        return await future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_wait)
+        self._flusher = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending and self._flusher is None:
+            self._flusher = self._spawn(self._flush_later())
+        if not batch:
+            return
+
+        inputs = list(dict.fromkeys(query for query, _ in batch))
+        try:
+            response = await create_async_embedding_client().embeddings.create(
+                input=inputs,
+                model=AZURE_OPENAI_EMBEDDING_MODEL,
+            )
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        embeddings = {inputs[item.index]: item.embedding for item in response.data}
+        for query, future in batch:
+            if not future.done():
+                future.set_result(embeddings[query])
+
+
+@lru_cache(maxsize=1)
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Return the process-wide embedding batcher."""
+    return EmbeddingBatcher()
+
+def setup_azure_ai_observability(enable_sensitive_data: bool | None = None) -> None:
     """Use this method to setup tracing in your Azure AI Project.
 
     This will take the connection string from the AIProjectClient instance.
     It will override any connection string that is set in the environment variables.
     It will disable any OTLP endpoint that might have been set.
     """
+    global _observability_initialized
+    if _observability_initialized:
+        return
+
+    from azure.core.exceptions import ResourceNotFoundError
 
     conn_string = None
 
     try:
-        project_endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT", "").strip()
+        project_endpoint = AZURE_AI_PROJECT_ENDPOINT
 
         if (project_endpoint):
             logger.info("AZURE_AI_PROJECT_ENDPOINT found: %s", project_endpoint)
-            print("Using Azure AI Project Endpoint authentication.")
         
-            credential = DefaultAzureCredential()
-
-            project_client = AIProjectClient(endpoint=project_endpoint, credential=credential)
-            conn_string = project_client.telemetry.get_application_insights_connection_string()
+            conn_string = get_project_client().telemetry.get_application_insights_connection_string()
 
         app_insights_connection_string = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING", "").strip()
 
@@ -90,14 +239,50 @@ async def setup_azure_ai_observability(enable_sensitive_data: bool | None = None
         logger.warning("No Application Insights connection string found. Observability will not be set up.")
         return
     setup_observability(applicationinsights_connection_string=conn_string, enable_sensitive_data=enable_sensitive_data)
+    _observability_initialized = True
     logger.info("Observability is set up with Application Insights connection string from Azure AI Project.")
 
 
+class ConcurrencyLimitMiddleware(ChatMiddleware):
+    """Queues chat requests on the client once the deployment's concurrency budget is used up."""
+
+    def __init__(self, limit: int) -> None:
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def process(self, context: ChatContext, next) -> None:
+        if not context.is_streaming:
+            async with self._semaphore:
+                await next(context)
+            return
+
+        # Streaming requests are sent when the result is iterated, so hold the slot until the stream ends
+        await next(context)
+        stream = context.result
+        if stream is None:
+            return
+
+        async def limited_stream():
+            async with self._semaphore:
+                async for update in stream:
+                    yield update
+
+        context.result = limited_stream()
+
+
+@lru_cache(maxsize=None)
+def _deployment_limiter(model_name: str) -> ConcurrencyLimitMiddleware:
+    """Return the concurrency limiter shared by all chat clients of a deployment."""
+    return ConcurrencyLimitMiddleware(AZURE_OPENAI_MAX_CONCURRENT_REQUESTS)
+
+
+@lru_cache(maxsize=None)
 def create_chat_client(model_name: str, agent_name: str = "") -> BaseChatClient:
-    """Create an OpenAIChatClient."""
+    """Create an OpenAIChatClient.
 
-    token: str
-    endpoint: str
+    Clients are cached per (model_name, agent_name), so repeated calls reuse the
+    same client and credential instead of rebuilding them.
+    """
+    from agent_framework.azure import AzureAIAgentClient
 
     if (not model_name) or model_name.strip() == "":
         logger.error("Model name is missing. Set COMPLETION_DEPLOYMENT_NAME in your .env file.")
@@ -105,47 +290,53 @@ def create_chat_client(model_name: str, agent_name: str = "") -> BaseChatClient:
             "Model name for OpenAIChatClient is not set. Please set COMPLETION_DEPLOYMENT_NAME in your .env file."
         )
 
-    project_endpoint = os.environ.get("AZURE_AI_PROJECT_ENDPOINT", "").strip()
-    azure_api_key = os.environ.get("AZURE_OPENAI_API_KEY", "").strip()
-    azure_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT", "").strip()
+    project_endpoint = AZURE_AI_PROJECT_ENDPOINT
+    azure_endpoint = AZURE_OPENAI_ENDPOINT
 
     if project_endpoint:
         logger.info("AZURE_AI_PROJECT_ENDPOINT found: %s", project_endpoint)
-        print("Using Azure AI Project Endpoint authentication.")
-        credential = DefaultAzureCredential()
         return AzureAIAgentClient(
             project_endpoint=project_endpoint,
-            credential=credential,
+            credential=get_credential(),
             model_deployment_name=model_name,
             agent_name=agent_name,
-            should_cleanup_agent = False
+            should_cleanup_agent = False,
+            middleware=_deployment_limiter(model_name),
         )
     
     if azure_endpoint:
-        logger.info("AZURE_OPENAI_ENDPOINT found: %s", azure_endpoint)
-
-        if azure_api_key:
-            print("Using Azure OpenAI API key authentication.")
-            logger.info("AZURE_OPENAI_API_KEY found - using API key authentication.")
-            token = azure_api_key
-            endpoint = azure_endpoint
-            return AzureOpenAIChatClient(
-                deployment_name=model_name,
-                azure_api_key=token,
-                endpoint=endpoint,
-            )   
-        
-        else:
-            print("Using Azure OpenAI AAD authentication.")
-            logger.info("AZURE_OPENAI_API_KEY not found - will use AAD authentication.")
-            token_provider = get_bearer_token_provider(
-                DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-            )
-            endpoint = azure_endpoint
-
-            return AzureOpenAIChatClient(
-                deployment_name=model_name,
-                ad_token_provider=token_provider,
-                endpoint=endpoint,
-            )   
-    
\ No newline at end of file
+        return _create_azure_openai_chat_client(model_name)
+
+
+@lru_cache(maxsize=None)
+def _create_azure_openai_chat_client(model_name: str) -> BaseChatClient:
+    """Azure OpenAI chat clients carry no per-agent state, so agents on the same deployment share one."""
+    from agent_framework.azure import AzureOpenAIChatClient
+    from openai import DEFAULT_TIMEOUT, AsyncAzureOpenAI
+
+    azure_api_key = AZURE_OPENAI_API_KEY
+    azure_endpoint = AZURE_OPENAI_ENDPOINT
+    logger.info("AZURE_OPENAI_ENDPOINT found: %s", azure_endpoint)
+
+    if azure_api_key:
+        logger.info("AZURE_OPENAI_API_KEY found - using API key authentication.")
+        auth = {"api_key": azure_api_key}
+    else:
+        logger.info("AZURE_OPENAI_API_KEY not found - will use AAD authentication.")
+        auth = {"azure_ad_token_provider": _get_token_provider()}
+
+    # Chat clients of every deployment reuse the process-wide connection pool of the async embedding client
+    async_client = AsyncAzureOpenAI(
+        azure_deployment=model_name,
+        api_version=AZURE_OPENAI_VERSION,
+        azure_endpoint=azure_endpoint,
+        http_client=_get_async_http_client(),
+        timeout=DEFAULT_TIMEOUT,
+        **auth,
+    )
+    return AzureOpenAIChatClient(
+        deployment_name=model_name,
+        endpoint=azure_endpoint,
+        async_client=async_client,
+        middleware=_deployment_limiter(model_name),
+    )
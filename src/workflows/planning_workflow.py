@@ -9,47 +9,74 @@ This workflow demonstrates a multi-agent scenario:
 - Summarizer answers the original user question using execution results
 """
 
-from json import tool
+import asyncio
+import hashlib
 import os
-from dataclasses import dataclass, asdict, is_dataclass
-from typing import Any, Optional
+import time
+from collections import OrderedDict
+from dataclasses import is_dataclass
+from functools import cache
+from typing import Optional
 import logging
 
-
+import numpy as np
 from agent_framework import (
+    AgentExecutorRequest,
+    AgentExecutorResponse,
+    AgentRunResponseUpdate,
+    AgentRunUpdateEvent,
+    ChatMessage,
+    Executor,
+    Role,
+    TextContent,
     WorkflowBuilder,
     WorkflowContext,
     ai_function,
-    executor,
     handler,
 )
 from agent_framework.observability import get_tracer
 from dotenv import load_dotenv
 
 from src.data.agent_query_example import AgentQueryExample
-from src.tools.agent_registry import AgentRegistryTool
+from src.tools.agent_registry import AgentRegistryTool, normalize_query
 from src.tools.taxonomy_tool import TaxonomyTool
 
-from src.workflows.model_client import create_chat_client, create_embedding_client, setup_azure_ai_observability
-
-from opentelemetry.trace import SpanKind
-from opentelemetry.trace.span import format_trace_id
+from src.workflows.model_client import (
+    create_chat_client,
+    get_embedding_batcher,
+    setup_azure_ai_observability,
+)
 
 load_dotenv()
 
 logging.getLogger('azure.core.pipeline.policies.http_logging_policy').setLevel(logging.WARNING)
 logging.getLogger('azure.monitor.opentelemetry.exporter.export').setLevel(logging.WARNING)
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
 logger = logging.getLogger(__name__)
 
 
 AZURE_OPENAI_SMALL_CHAT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_SMALL_CHAT_DEPLOYMENT_NAME", "")
 AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME", "")
+# Moderator and Executor only look up terms and dispatch tool calls, so they can run on a smaller tier
+AZURE_OPENAI_NANO_CHAT_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_NANO_CHAT_DEPLOYMENT_NAME", "") or AZURE_OPENAI_SMALL_CHAT_DEPLOYMENT_NAME
+# Registries larger than this are not listed in the Planner prompt; the Planner shortlists agents instead
+PLANNER_AGENT_LIST_LIMIT = int(os.getenv("PLANNER_AGENT_LIST_LIMIT", "20"))
+PLANNER_AGENT_SHORTLIST_SIZE = int(os.getenv("PLANNER_AGENT_SHORTLIST_SIZE", "10"))
+# Agent calls of one Executor batch that run at the same time
+EXECUTOR_CONCURRENCY = int(os.getenv("EXECUTOR_CONCURRENCY", "8"))
+
+RESPONSE_CACHE_SIZE = int(os.getenv("WORKFLOW_RESPONSE_CACHE_SIZE", "512"))
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CACHE_SIMILARITY_THRESHOLD", "0.95"))
+CACHE_DEFAULT_TTL = float(os.getenv("CACHE_DEFAULT_TTL", "3600"))
 
 # Instantiate shared tools
 _agent_registry_tool = AgentRegistryTool()
 _taxonomy_tool = TaxonomyTool()
+_agent_call_limit = asyncio.Semaphore(EXECUTOR_CONCURRENCY)
 
 @ai_function
 async def generate_agent_query(
@@ -67,7 +94,7 @@ async def generate_agent_query(
 
     Returns:
         A dictionary containing the recommended agent information including:
-        - agent_id: The unique identifier of the recommended agent (use this for execute_agent_query)
+        - agent_id: The unique identifier of the recommended agent (use this for execute_agent_queries_parallel)
         - agent_name: Human-readable name of the agent
         - description: What the agent can do
         - confidence: How well the agent matches the query
@@ -75,7 +102,7 @@ async def generate_agent_query(
     Usage:
         1. Call this tool FIRST to discover which agent can handle the user's request
         2. Review the returned agent recommendation before proceeding
-        3. Use the returned agent_id in subsequent execute_agent_query calls
+        3. Use the returned agent_id in subsequent execute_agent_queries_parallel calls
         4. NEVER fabricate agent IDs - always use values returned by this tool
     """
 
@@ -86,46 +113,82 @@ async def generate_agent_query(
         logging.exception("generate_agent_query failed")
         return [{"error": f"generate_agent_query: {str(e)}"}]
 
+async def _execute_agent_call(agent_id: str, query: str) -> dict:
+    """Run one agent call and normalize its result, reporting failures per call."""
+    try:
+        async with _agent_call_limit:
+            agent_query = await _agent_registry_tool.execute_agent(agent_id=agent_id, query=query)
+        if is_dataclass(agent_query) and not isinstance(agent_query, type):
+            # Execution results are flat, so a shallow copy of the fields replaces asdict's deep copy
+            result = dict(vars(agent_query))
+        elif isinstance(agent_query, dict):
+            result = agent_query
+        else:
+            result = {"result": str(agent_query)}
+    except Exception as e:
+        logging.exception("execute_agent_queries_parallel failed for %s", agent_id)
+        result = {"error": f"execute_agent_queries_parallel: {str(e)}"}
+    return {"agent_id": agent_id, "query": query, **result}
+
 @ai_function
-async def execute_agent_query(
-    agent_id: str, query: str
-) -> AgentQueryExample:
-    """Execute a query using a specific agent identified by its agent_id.
+async def execute_agent_queries_parallel(
+    calls: list[dict[str, str]]
+) -> list[dict]:
+    """Execute one or more agent queries concurrently, each identified by its agent_id.
 
-    CRITICAL: Only use agent_id values that were returned by the generate_agent_query tool.
-    Do NOT invent or guess agent IDs - this will cause execution failures.
+    CRITICAL: Only use agent_id values that were returned by the generate_agent_query tool
+    or listed in the Planner's plan. Do NOT invent or guess agent IDs - this will cause
+    execution failures.
 
     Args:
-        agent_id: The unique identifier of the agent to execute. This MUST be an agent_id
-                  returned from a previous call to generate_agent_query.
-        query: The specific query or task to send to the agent for execution.
+        calls: List of calls to execute, each a dictionary with:
+               - agent_id: The unique identifier of the agent to execute.
+               - query: The specific query or task to send to that agent.
+               All calls in one batch run at the same time, so only batch steps
+               that do not depend on each other's results.
 
     Returns:
-        A dictionary containing the execution results from the agent, including:
-        - status: Whether the execution succeeded or failed
-        - result: The actual output/response from the agent
-        - metadata: Additional information about the execution
+        A list with one dictionary per call, in the same order as `calls`, with:
+        - agent_id and query: The call this entry belongs to
+        - id: The agent_id the registry resolved
+        - content: The agent's answer, or the error message when is_error is true
+        - is_error: Whether the agent call failed
+        - score: Optional relevance score, usually empty
+        If the call could not be made at all, the entry has an error key with the
+        exact message instead of id, content and is_error.
 
     Usage:
-        1. ALWAYS call generate_agent_query first to get a valid agent_id
-        2. Pass the exact agent_id returned - do not modify or fabricate IDs
-        3. Formulate a clear, specific query for the agent to execute
+        1. Put all plan steps with an empty depends_on list into ONE call
+        2. Call again with the dependent steps once their inputs are available
+        3. Pass the exact agent_id values - do not modify or fabricate IDs
         4. Base your summaries and responses ONLY on the data returned by this tool
-        5. If execution fails, report the error - do not make up results
+        5. If a call fails, report its error - do not make up results
     """
 
+    return list(await asyncio.gather(
+        *(_execute_agent_call(agent_id=call.get("agent_id", ""), query=call.get("query", "")) for call in calls)
+    ))
+    
+@ai_function
+async def shortlist_agents(clarified_query: str) -> str:
+    """List the registered agents that are most relevant to the clarified user request.
+
+    IMPORTANT: The agent registry is too large to list in full. Call this tool FIRST,
+    with the Moderator's clarified request, to get the agents you may plan with.
+
+    Args:
+        clarified_query: The clarified request from the Moderator, using verified terminology.
+
+    Returns:
+        One line per agent, best match first, with its agent_id, name, description and skills.
+        Only the agent_id values in this result may be used in the plan.
+    """
     try:
-        agent_query = await _agent_registry_tool.execute_agent(agent_id=agent_id, query=query)
-        if is_dataclass(agent_query) and not isinstance(agent_query, type):
-            return asdict(agent_query)
-        elif isinstance(agent_query, dict):
-            return agent_query
-        else:
-            return {"result": str(agent_query)}
+        return await _agent_registry_tool.shortlist_agents(clarified_query, k=PLANNER_AGENT_SHORTLIST_SIZE)
     except Exception as e:
-        logging.exception("execute_agent_query failed")
-        return [{"error": f"execute_agent_query: {str(e)}"}]
-    
+        logging.exception("shortlist_agents failed")
+        return f"error: shortlist_agents: {str(e)}"
+
 @ai_function
 async def get_domain_hints(table_name: Optional[str] = None) -> str:
     """Retrieve domain-specific vocabulary and terminology hints from the taxonomy.
@@ -150,7 +213,7 @@ async def get_domain_hints(table_name: Optional[str] = None) -> str:
         1. Call this tool when you encounter domain-specific terminology
         2. Use the returned terms EXACTLY as provided in your queries
         3. Do not invent domain terms - only use what this tool returns
-        4. If a user's term doesn't match, use search_term_hints to find alternatives
+        4. If a user's term doesn't match, use batch_search_term_hints to find alternatives
     """
     try:
         return _taxonomy_tool.get_domain_hints(table_name=table_name)
@@ -159,39 +222,42 @@ async def get_domain_hints(table_name: Optional[str] = None) -> str:
         return f"error: get_domain_hints: {str(e)}"
 
 @ai_function
-async def search_term_hints(search_term: str) -> str:
-    """Search the taxonomy for domain hints matching a specific term or keyword.
+async def batch_search_term_hints(terms: list[str]) -> dict[str, str]:
+    """Search the taxonomy for domain hints matching each of several terms or keywords.
 
     Use this tool to find the correct domain terminology when you're unsure how
-    a concept is represented in the system. This is essential for accurate query formulation.
+    concepts are represented in the system. This is essential for accurate query formulation.
 
-    IMPORTANT: Call this tool when:
+    IMPORTANT: Call this tool ONCE with all key terms when:
     - A user uses informal or ambiguous language
     - You need to map user terms to system terminology
     - You want to discover related concepts in a domain
 
     Args:
-        search_term: The term to search for (e.g., 'plant', 'equipment', 'line', 'order').
-                    Use singular form for best results.
+        terms: All terms to search for (e.g., ['plant', 'equipment', 'line', 'order']).
+               Use singular form for best results.
 
     Returns:
-        Formatted information about domains containing the search term, including:
+        A dictionary mapping each term to formatted information about the domains containing it:
         - Matching domain categories
         - Related terms and concepts
         - Contextual usage information
 
     Usage:
         1. Use this when the user's terminology is unclear or informal
-        2. Search for key nouns from the user's request
+        2. Pass every key noun from the user's request in a single call
         3. Use the returned terminology in your queries - do not paraphrase
-        4. If no matches found, try alternative spellings or related terms
+        4. If a term has no matches, call again with alternative spellings or related terms
         5. NEVER assume terminology - always verify with this tool first
     """
-    try:
-        return _taxonomy_tool.get_term_hints(search_term=search_term)
-    except Exception as e:
-        logging.exception("search_term_hints failed")
-        return f"error: search_term_hints: {str(e)}"
+    hints = {}
+    for term in terms:
+        try:
+            hints[term] = _taxonomy_tool.get_term_hints(search_term=term)
+        except Exception as e:
+            logging.exception("batch_search_term_hints failed for %s", term)
+            hints[term] = f"error: batch_search_term_hints: {str(e)}"
+    return hints
 
 @ai_function
 async def list_domain_categories() -> str:
@@ -226,193 +292,349 @@ async def list_domain_categories() -> str:
         return f"error: list_domain_categories: {str(e)}"
 
 
-# Create Azure OpenAI chat client
-embedding_client = create_embedding_client()
-
-moderator_client = create_chat_client(model_name=AZURE_OPENAI_SMALL_CHAT_DEPLOYMENT_NAME, agent_name="Moderator")
-# Moderator: clarifies user intent and terminology
-moderator = moderator_client.create_agent(
-    name="Moderator",
-    instructions=(
-        "You are a Moderator responsible for clarifying the user's intent and ensuring correct terminology.\n\n"
-        "YOUR RESPONSIBILITIES:\n"
-        "1. Understand the user's request and identify key concepts\n"
-        "2. Use tools to verify terminology - NEVER assume domain terms\n"
-        "3. Map informal user language to official system terminology\n"
-        "4. Clarify ambiguous requests before proceeding\n\n"
-        "CRITICAL RULES:\n"
-        "- ALWAYS use search_term_hints or get_domain_hints to verify terminology\n"
-        "- NEVER invent or assume domain terms - only use terms returned by tools\n"
-        "- If the user's terms don't match any domain, ask for clarification\n"
-        "- Use list_domain_categories to understand available domains\n"
-        "- Your output must be grounded in tool results - do not fabricate information\n\n"
-        "WORKFLOW:\n"
-        "1. Extract key terms from user's request\n"
-        "2. Call search_term_hints for each key term to find correct terminology\n"
-        "3. If needed, call get_domain_hints for specific domain context\n"
-        "4. Reformulate the user's request using verified terminology\n"
-        "5. Pass the clarified intent to the next agent\n\n"
-        "OUTPUT FORMAT:\n"
-        "Provide a clear summary of:\n"
-        "- Original user intent\n"
-        "- Verified terminology (with tool sources)\n"
-        "- Clarified request ready for planning"
-    ),
-    tools=[search_term_hints, list_domain_categories, get_domain_hints],
-)
+class _ResponseCache():
+    """Summarizer answers per conversation, looked up by conversation hash and then by embedding similarity.
 
-# Get query hints from the schema tool's query hints tool
-_query_hints = _taxonomy_tool.get_all_query_hints()
-
-planner_client = create_chat_client(model_name=AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME, agent_name="Planner")
-
-# Get available agents list for the planner
-_available_agents = _agent_registry_tool.get_all_agents()
-
-# Planner: designs a query plan based on the user's objective
-planner = planner_client.create_agent(
-    name="Planner",
-    instructions=(
-        "You are a Planner responsible for designing an execution plan based on the user's objective.\n\n"
-        "=== AVAILABLE AGENTS (USE ONLY THESE) ===\n"
-        f"{_available_agents}\n"
-        "=== END OF AVAILABLE AGENTS ===\n\n"
-        "CRITICAL CONSTRAINT: You can ONLY use the agents listed above. Do NOT invent, assume, or reference any other agents.\n\n"
-        "YOUR RESPONSIBILITIES:\n"
-        "1. Analyze the clarified intent from the Moderator\n"
-        "2. Select the best agent(s) from the AVAILABLE AGENTS list above\n"
-        "3. Design a step-by-step execution plan using ONLY those agents\n"
-        "4. Ensure all terminology is verified with domain tools\n\n"
-        "CRITICAL RULES:\n"
-        "- You MUST ONLY use agent_id values from the AVAILABLE AGENTS list above\n"
-        "- Do NOT fabricate, invent, or assume any agent names, IDs, or capabilities\n"
-        "- If no agent from the list can handle the request, clearly state this limitation\n"
-        "- Use search_term_hints and get_domain_hints to verify domain terminology\n"
-        "- Your plan must be executable using ONLY the agents listed above\n"
-        "- Match user intent to agent skills and examples from the list\n\n"
-        "WORKFLOW:\n"
-        "1. Review the clarified request from the Moderator\n"
-        "2. Review the AVAILABLE AGENTS list and their capabilities\n"
-        "3. Select the most appropriate agent(s) based on their skills and examples\n"
-        "4. If domain terms need verification, use search_term_hints or get_domain_hints\n"
-        "5. Create an execution plan with specific agent_ids from the available list\n\n"
-        "OUTPUT FORMAT:\n"
-        "Provide a structured plan with:\n"
-        "- Goal: What the user wants to achieve\n"
-        "- Selected Agent(s): List the exact agent_id values from the AVAILABLE AGENTS list\n"
-        "- Justification: Why each selected agent is appropriate (reference their skills/examples)\n"
-        "- Steps: Ordered list of agent executions with specific queries\n"
-        "- Expected output: What data the execution should return\n\n"
-        "REMINDER: If you cannot find a suitable agent from the available list, say so. Never make up agents."
-    ),
-    tools=[search_term_hints, get_domain_hints],
-)
+    The semantic tier only compares the latest question of conversations whose earlier
+    messages are identical, so a follow-up never matches an answer from another conversation.
+    """
 
+    def __init__(self, capacity: int, ttl_seconds: float) -> None:
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.exact: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # Semantic tier: ring buffer of unit-length question embeddings, allocated on first insert
+        self.embeddings: Optional[np.ndarray] = None
+        self.contexts = np.empty(capacity, dtype=object)
+        self.stored_at = np.zeros(capacity, dtype=np.float64)
+        self.texts: list[Optional[str]] = [None] * capacity
+        self.size = 0
+        self.next_slot = 0
+
+    @staticmethod
+    def key(messages: list[ChatMessage]) -> str:
+        """Hash the role and normalized text of every message of the conversation."""
+        digest = hashlib.sha256()
+        for message in messages:
+            digest.update(f"{message.role}\0{normalize_query(message.text or '')}\0".encode())
+        return digest.hexdigest()
+
+    def get_exact(self, key: str) -> Optional[str]:
+        entry = self.exact.get(key)
+        if entry is None:
+            return None
+        stored_at, text = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self.exact[key]
+            return None
+        self.exact.move_to_end(key)
+        return text
+
+    def get_similar(self, context: str, embedding: np.ndarray, threshold: float) -> Optional[str]:
+        if self.size == 0 or embedding.shape[0] != self.embeddings.shape[1]:
+            return None
+        scores = self.embeddings[:self.size] @ embedding
+        scores[self.contexts[:self.size] != context] = -1.0
+        scores[time.monotonic() - self.stored_at[:self.size] > self.ttl_seconds] = -1.0
+        best = int(scores.argmax())
+        if scores[best] <= threshold:
+            return None
+        return self.texts[best]
+
+    def put(self, key: str, context: str, embedding: Optional[np.ndarray], text: str) -> None:
+        now = time.monotonic()
+        self.exact[key] = (now, text)
+        self.exact.move_to_end(key)
+        if len(self.exact) > self.capacity:
+            self.exact.popitem(last=False)
+
+        if embedding is None:
+            return
+        if self.embeddings is None:
+            self.embeddings = np.zeros((self.capacity, embedding.shape[0]), dtype=np.float32)
+        self.embeddings[self.next_slot] = embedding
+        self.contexts[self.next_slot] = context
+        self.stored_at[self.next_slot] = now
+        self.texts[self.next_slot] = text
+        self.next_slot = (self.next_slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+
+_response_cache = _ResponseCache(RESPONSE_CACHE_SIZE, CACHE_DEFAULT_TTL)
+
+
+async def _aembed_query(query: str) -> np.ndarray:
+    """Embed the user query as a unit-length vector, batched with concurrent embedding requests."""
+    embedding = np.asarray(await get_embedding_batcher().embed(query), dtype=np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+class ResponseCacheLookup(Executor):
+    """Answers repeated questions from the response cache and forwards the rest to the Moderator."""
+
+    def __init__(self) -> None:
+        super().__init__(id="response_cache_lookup")
+
+    @handler
+    async def from_text(self, text: str, ctx: WorkflowContext[AgentExecutorRequest, str]) -> None:
+        await self._lookup([ChatMessage(role=Role.USER, text=text)], ctx)
+
+    @handler
+    async def from_message(self, message: ChatMessage, ctx: WorkflowContext[AgentExecutorRequest, str]) -> None:
+        await self._lookup([message], ctx)
+
+    @handler
+    async def from_messages(
+        self, messages: list[ChatMessage], ctx: WorkflowContext[AgentExecutorRequest, str]
+    ) -> None:
+        await self._lookup(messages, ctx)
+
+    async def _lookup(self, messages: list[ChatMessage], ctx: WorkflowContext[AgentExecutorRequest, str]) -> None:
+        key = _ResponseCache.key(messages)
+        # Earlier messages scope the semantic tier, the latest question is what gets embedded
+        context = _ResponseCache.key(messages[:-1])
+        query = messages[-1].text if messages else ""
+        embedding = None
+        cached = _response_cache.get_exact(key)
+        if cached is None and query:
+            try:
+                embedding = await _aembed_query(query)
+                cached = _response_cache.get_similar(context, embedding, CACHE_SIMILARITY_THRESHOLD)
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("Workflow response cache unavailable: %s", exc)
+
+        if cached is not None:
+            logger.info("Workflow response cache hit")
+            await ctx.add_event(
+                AgentRunUpdateEvent(
+                    self.id,
+                    AgentRunResponseUpdate(contents=[TextContent(text=cached)], role=Role.ASSISTANT),
+                )
+            )
+            await ctx.yield_output(cached)
+            return
+
+        await ctx.set_shared_state("response_cache_key", key)
+        await ctx.set_shared_state("response_cache_context", context)
+        await ctx.set_shared_state(
+            "response_cache_embedding", embedding.tolist() if embedding is not None else None
+        )
+        await ctx.send_message(AgentExecutorRequest(messages=messages, should_respond=True))
+
+
+class ResponseCacheStore(Executor):
+    """Stores the Summarizer answer under the query seen by ResponseCacheLookup."""
+
+    def __init__(self) -> None:
+        super().__init__(id="response_cache_store")
+
+    @handler
+    async def store(self, response: AgentExecutorResponse, ctx: WorkflowContext) -> None:
+        text = response.agent_run_response.text
+        if not text:
+            return
+        key = await ctx.get_shared_state("response_cache_key")
+        context = await ctx.get_shared_state("response_cache_context")
+        embedding = await ctx.get_shared_state("response_cache_embedding")
+        _response_cache.put(
+            key, context, np.asarray(embedding, dtype=np.float32) if embedding is not None else None, text
+        )
+
+
+@cache
+def get_workflow():
+    """Build the agents and the workflow on first use rather than at import."""
+    moderator_client = create_chat_client(model_name=AZURE_OPENAI_NANO_CHAT_DEPLOYMENT_NAME, agent_name="Moderator")
+    # Moderator: clarifies user intent and terminology
+    moderator = moderator_client.create_agent(
+        name="Moderator",
+        instructions=(
+            "You are a Moderator responsible for clarifying the user's intent and ensuring correct terminology.\n\n"
+            "YOUR RESPONSIBILITIES:\n"
+            "1. Understand the user's request and identify key concepts\n"
+            "2. Use tools to verify terminology - NEVER assume domain terms\n"
+            "3. Map informal user language to official system terminology\n"
+            "4. Clarify ambiguous requests before proceeding\n\n"
+            "CRITICAL RULES:\n"
+            "- ALWAYS use batch_search_term_hints or get_domain_hints to verify terminology\n"
+            "- NEVER invent or assume domain terms - only use terms returned by tools\n"
+            "- If the user's terms don't match any domain, ask for clarification\n"
+            "- Use list_domain_categories to understand available domains\n"
+            "- Your output must be grounded in tool results - do not fabricate information\n\n"
+            "WORKFLOW:\n"
+            "1. Extract key terms from user's request\n"
+            "2. Call batch_search_term_hints ONCE with all key terms to find correct terminology\n"
+            "3. If needed, call get_domain_hints for specific domain context\n"
+            "4. Reformulate the user's request using verified terminology\n"
+            "5. Pass the clarified intent to the next agent\n\n"
+            "OUTPUT FORMAT:\n"
+            "Provide a clear summary of:\n"
+            "- Original user intent\n"
+            "- Verified terminology (with tool sources)\n"
+            "- Clarified request ready for planning"
+        ),
+        tools=[batch_search_term_hints, list_domain_categories, get_domain_hints],
+    )
 
-executor_client = create_chat_client(model_name=AZURE_OPENAI_SMALL_CHAT_DEPLOYMENT_NAME, agent_name="Executor")
-# Executor: executes the chosen query plan
-executor_agent = executor_client.create_agent(
-    name="Executor",
-    instructions=(
-        "You are an Executor responsible for running the execution plan created by the Planner.\n\n"
-        "YOUR RESPONSIBILITIES:\n"
-        "1. Execute the plan step-by-step using execute_agent_query\n"
-        "2. Collect and organize results from each agent execution\n"
-        "3. Handle errors gracefully and report failures accurately\n"
-        "4. Pass complete, unmodified results to the Summarizer\n\n"
-        "CRITICAL RULES:\n"
-        "- ONLY use agent_id values provided in the Planner's output\n"
-        "- NEVER invent, modify, or guess agent IDs\n"
-        "- Execute agents in the order specified by the plan\n"
-        "- Report EXACT results returned by execute_agent_query - do not modify or embellish\n"
-        "- If an execution fails, report the actual error - do not fabricate success\n"
-        "- Do NOT add information that wasn't returned by the tools\n"
-        "- If results are empty or unexpected, report this accurately\n\n"
-        "WORKFLOW:\n"
-        "1. Parse the execution plan from the Planner\n"
-        "2. For each step, call execute_agent_query with the specified agent_id and query\n"
-        "3. Capture the complete response from each execution\n"
-        "4. Compile all results maintaining the original structure and data\n"
-        "5. Pass the compiled results to the Summarizer\n\n"
-        "OUTPUT FORMAT:\n"
-        "Provide execution results with:\n"
-        "- Execution status for each step (success/failure)\n"
-        "- Complete, unmodified results from each agent\n"
-        "- Any errors encountered (exact error messages)\n"
-        "- Clear indication of what data is available for summarization"
-    ),
-    tools=[execute_agent_query],
-)
+    planner_client = create_chat_client(model_name=AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME, agent_name="Planner")
+
+    # Get available agents list for the planner; large registries are shortlisted per request instead
+    planner_tools = [batch_search_term_hints, get_domain_hints]
+    if len(_agent_registry_tool.AGENT_CARDS) > PLANNER_AGENT_LIST_LIMIT:
+        _available_agents = (
+            "The registry is too large to list here. Call shortlist_agents with the clarified request FIRST; "
+            "the agents it returns are the AVAILABLE AGENTS for this plan."
+        )
+        planner_tools.insert(0, shortlist_agents)
+    else:
+        _available_agents = _agent_registry_tool.get_all_agents()
+
+    # Planner: designs a query plan based on the user's objective
+    planner = planner_client.create_agent(
+        name="Planner",
+        instructions=(
+            "You are a Planner responsible for designing an execution plan based on the user's objective.\n\n"
+            "=== AVAILABLE AGENTS (USE ONLY THESE) ===\n"
+            f"{_available_agents}\n"
+            "=== END OF AVAILABLE AGENTS ===\n\n"
+            "CRITICAL CONSTRAINT: You can ONLY use the agents listed above. Do NOT invent, assume, or reference any other agents.\n\n"
+            "YOUR RESPONSIBILITIES:\n"
+            "1. Analyze the clarified intent from the Moderator\n"
+            "2. Select the best agent(s) from the AVAILABLE AGENTS list above\n"
+            "3. Design a step-by-step execution plan using ONLY those agents\n"
+            "4. Ensure all terminology is verified with domain tools\n\n"
+            "CRITICAL RULES:\n"
+            "- You MUST ONLY use agent_id values from the AVAILABLE AGENTS list above\n"
+            "- Do NOT fabricate, invent, or assume any agent names, IDs, or capabilities\n"
+            "- If no agent from the list can handle the request, clearly state this limitation\n"
+            "- Use batch_search_term_hints (one call with all terms) and get_domain_hints to verify domain terminology\n"
+            "- Your plan must be executable using ONLY the agents listed above\n"
+            "- Match user intent to agent skills and examples from the list\n\n"
+            "WORKFLOW:\n"
+            "1. Review the clarified request from the Moderator\n"
+            "2. Review the AVAILABLE AGENTS list and their capabilities\n"
+            "3. Select the most appropriate agent(s) based on their skills and examples\n"
+            "4. If domain terms need verification, use batch_search_term_hints or get_domain_hints\n"
+            "5. Create an execution plan with specific agent_ids from the available list\n\n"
+            "OUTPUT FORMAT:\n"
+            "Provide a structured plan with:\n"
+            "- Goal: What the user wants to achieve\n"
+            "- Selected Agent(s): List the exact agent_id values from the AVAILABLE AGENTS list\n"
+            "- Justification: Why each selected agent is appropriate (reference their skills/examples)\n"
+            "- Steps: Numbered list of agent executions with specific queries, each with a depends_on list\n"
+            "  of the step numbers whose results it needs (depends_on: [] when it needs none)\n"
+            "- Expected output: What data the execution should return\n\n"
+            "REMINDER: If you cannot find a suitable agent from the available list, say so. Never make up agents."
+        ),
+        tools=planner_tools,
+    )
 
-summarizer_client = create_chat_client(model_name=AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME, agent_name="Summarizer")
-# Summarizer: answers the original user question using execution results
-summarizer = summarizer_client.create_agent(
-    name="Summarizer",
-    instructions=(
-        "You are a Summarizer responsible for answering the user's original question using execution results.\n\n"
-        "YOUR RESPONSIBILITIES:\n"
-        "1. Review the original user question and the execution results\n"
-        "2. Synthesize a clear, accurate answer based ONLY on the provided data\n"
-        "3. Present information in a user-friendly format\n"
-        "4. Acknowledge limitations when data is incomplete\n\n"
-        "CRITICAL RULES:\n"
-        "- ONLY use information from the execution results - do not add external knowledge\n"
-        "- NEVER fabricate, invent, or assume data that wasn't in the results\n"
-        "- If the results don't fully answer the question, clearly state what's missing\n"
-        "- Quote or reference specific data points from the results\n"
-        "- If results contain errors, explain what went wrong based on the error messages\n"
-        "- Do NOT speculate about what the results 'might' contain\n"
-        "- Distinguish clearly between facts from results and any necessary interpretation\n\n"
-        "WORKFLOW:\n"
-        "1. Identify the original user question\n"
-        "2. Review all execution results from the Executor\n"
-        "3. Extract relevant data points that address the question\n"
-        "4. Organize the information logically\n"
-        "5. Compose a clear, grounded response\n\n"
-        "OUTPUT FORMAT:\n"
-        "Provide a response that:\n"
-        "- Directly answers the user's question\n"
-        "- Cites specific data from execution results\n"
-        "- Clearly indicates the source of each piece of information\n"
-        "- Notes any limitations or gaps in the available data\n"
-        "- Uses clear, accessible language"
-    ),
-)
 
+    executor_client = create_chat_client(model_name=AZURE_OPENAI_NANO_CHAT_DEPLOYMENT_NAME, agent_name="Executor")
+    # Executor: executes the chosen query plan
+    executor_agent = executor_client.create_agent(
+        name="Executor",
+        instructions=(
+            "You are an Executor responsible for running the execution plan created by the Planner.\n\n"
+            "YOUR RESPONSIBILITIES:\n"
+            "1. Execute the plan using execute_agent_queries_parallel\n"
+            "2. Collect and organize results from each agent execution\n"
+            "3. Handle errors gracefully and report failures accurately\n"
+            "4. Pass complete, unmodified results to the Summarizer\n\n"
+            "CRITICAL RULES:\n"
+            "- ONLY use agent_id values provided in the Planner's output\n"
+            "- NEVER invent, modify, or guess agent IDs\n"
+            "- Run all steps whose depends_on list is empty in ONE execute_agent_queries_parallel call\n"
+            "- Run a dependent step only after the steps it depends on have returned\n"
+            "- Report EXACT results returned by execute_agent_queries_parallel - do not modify or embellish\n"
+            "- If an execution fails, report the actual error - do not fabricate success\n"
+            "- Do NOT add information that wasn't returned by the tools\n"
+            "- If results are empty or unexpected, report this accurately\n\n"
+            "WORKFLOW:\n"
+            "1. Parse the execution plan from the Planner\n"
+            "2. Call execute_agent_queries_parallel once with every independent step (agent_id and query)\n"
+            "3. Call it again for each group of steps whose dependencies are now satisfied\n"
+            "4. Capture the complete response from each execution\n"
+            "5. Compile all results maintaining the original structure and data\n"
+            "6. Pass the compiled results to the Summarizer\n\n"
+            "OUTPUT FORMAT:\n"
+            "Provide execution results with:\n"
+            "- Execution status for each step (success/failure)\n"
+            "- Complete, unmodified results from each agent\n"
+            "- Any errors encountered (exact error messages)\n"
+            "- Clear indication of what data is available for summarization"
+        ),
+        tools=[execute_agent_queries_parallel],
+    )
 
-workflow = (
-    WorkflowBuilder(
-        name="Friday Query Workflow",
-        description=(
-            "Multi-agent workflow: clarify objective, retrieve examples, "
-            "design and validate queries, execute, then summarize."
+    summarizer_client = create_chat_client(model_name=AZURE_OPENAI_BIG_CHAT_DEPLOYMENT_NAME, agent_name="Summarizer")
+    # Summarizer: answers the original user question using execution results
+    summarizer = summarizer_client.create_agent(
+        name="Summarizer",
+        instructions=(
+            "You are a Summarizer responsible for answering the user's original question using execution results.\n\n"
+            "YOUR RESPONSIBILITIES:\n"
+            "1. Review the original user question and the execution results\n"
+            "2. Synthesize a clear, accurate answer based ONLY on the provided data\n"
+            "3. Present information in a user-friendly format\n"
+            "4. Acknowledge limitations when data is incomplete\n\n"
+            "CRITICAL RULES:\n"
+            "- ONLY use information from the execution results - do not add external knowledge\n"
+            "- NEVER fabricate, invent, or assume data that wasn't in the results\n"
+            "- If the results don't fully answer the question, clearly state what's missing\n"
+            "- Quote or reference specific data points from the results\n"
+            "- If results contain errors, explain what went wrong based on the error messages\n"
+            "- Do NOT speculate about what the results 'might' contain\n"
+            "- Distinguish clearly between facts from results and any necessary interpretation\n\n"
+            "WORKFLOW:\n"
+            "1. Identify the original user question\n"
+            "2. Review all execution results from the Executor\n"
+            "3. Extract relevant data points that address the question\n"
+            "4. Organize the information logically\n"
+            "5. Compose a clear, grounded response\n\n"
+            "OUTPUT FORMAT:\n"
+            "Provide a response that:\n"
+            "- Directly answers the user's question\n"
+            "- Cites specific data from execution results\n"
+            "- Clearly indicates the source of each piece of information\n"
+            "- Notes any limitations or gaps in the available data\n"
+            "- Uses clear, accessible language"
         ),
     )
-    .set_start_executor(moderator)
-    .add_edge(moderator, planner)
-    .add_edge(planner, executor_agent)
-    .add_edge(executor_agent, summarizer)
-    .build()
-)
 
-async def init_observability():
+
+    cache_lookup = ResponseCacheLookup()
+    cache_store = ResponseCacheStore()
+
+    return (
+        WorkflowBuilder(
+            name="Friday Query Workflow",
+            description=(
+                "Multi-agent workflow: clarify objective, retrieve examples, "
+                "design and validate queries, execute, then summarize."
+            ),
+        )
+        .set_start_executor(cache_lookup)
+        .add_edge(cache_lookup, moderator)
+        .add_edge(moderator, planner)
+        .add_edge(planner, executor_agent)
+        .add_edge(executor_agent, summarizer)
+        .add_edge(summarizer, cache_store)
+        .build()
+    )
+
+def init_observability():
     """Initialize observability for the workflow."""
-    await setup_azure_ai_observability(enable_sensitive_data=False)
+    setup_azure_ai_observability(enable_sensitive_data=False)
 
 def main():
     """Launch the branching workflow in DevUI."""
 
-    import asyncio
-    asyncio.run(
-        init_observability()
-    )
-
-    logging.basicConfig(level=logging.INFO, format="%(message)s")
-    logger = logging.getLogger(__name__)
+    init_observability()
 
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8093"))
-    auto_open = os.getenv("AUTO_OPEN", "True").lower() in (False, True)
+    auto_open = os.getenv("AUTO_OPEN", "true").lower() in ("1", "true", "yes")
     mode = os.getenv("MODE", "developer").lower()
 
     print("Host:", host)
@@ -421,6 +643,8 @@ def main():
     print("Mode:", mode)
 
     from agent_framework.devui import serve
+    from opentelemetry.trace import SpanKind
+    from opentelemetry.trace.span import format_trace_id
 
     # Build linear workflow:
     # Writer → Reviewer → Editor → Executor → Summarizer
@@ -437,7 +661,7 @@ def main():
         logger.info("- Executor runs the selected query against Azure Data Explorer")
         logger.info("- Summarizer answers the original user question using the results")
 
-        serve(entities=[workflow], host=host, port=port, auto_open=auto_open, mode=mode)
+        serve(entities=[get_workflow()], host=host, port=port, auto_open=auto_open, mode=mode)
 
 
 if __name__ == "__main__":